@@ -1,8 +1,9 @@
 """Read and write Jupyter notebooks as text files"""
 
 import traceback
-from .jupytext import readf, writef, writes, reads
+from .jupytext import readf, writef, writes, reads, iter_cells, read_metadata
 from .formats import NOTEBOOK_EXTENSIONS, guess_format, get_format_implementation
+from .cell_index import read_cell
 from .version import __version__
 
 try:
@@ -71,6 +72,6 @@ def _jupyter_nbextension_paths():  # pragma: no cover
         require="jupytext/index")]
 
 
-__all__ = ['readf', 'writef', 'writes', 'reads',
+__all__ = ['readf', 'writef', 'writes', 'reads', 'iter_cells', 'read_metadata', 'read_cell',
            'NOTEBOOK_EXTENSIONS', 'guess_format', 'get_format_implementation',
            'TextFileContentsManager', '__version__']
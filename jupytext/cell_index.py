@@ -0,0 +1,147 @@
+"""An index of the position of the cells in text notebooks, to read a single cell without reading the full notebook"""
+
+import os
+import io
+import json
+import mmap
+import hashlib
+from copy import copy
+import nbformat
+from .formats import long_form_one_format, get_format_implementation, read_format_from_metadata, guess_format
+from .header import parsed_document
+from .cell_reader import LineTypes
+from .languages import default_language_from_metadata_and_ext, main_language_from_metadata_and_ext
+from .languages import set_main_and_cell_language
+from .jupytext import TextNotebookConverter, readf
+from .version import __version__
+
+
+def default_index_dir():
+    """The directory where the cell indices are stored"""
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir, 'jupytext')
+
+
+def index_path(nb_file, index_dir=None):
+    """The path of the cell index for the given notebook"""
+    key = hashlib.sha1(os.path.abspath(nb_file).encode('utf-8')).hexdigest()
+    return os.path.join(index_dir or default_index_dir(), key + '.json')
+
+
+def file_signature(nb_file):
+    """The size and modification time of the file"""
+    info = os.stat(nb_file)
+    return [info.st_size, getattr(info, 'st_mtime_ns', info.st_mtime)]
+
+
+def build_cell_index(nb_file, fmt=None):
+    """Read the notebook, and return the position of its cells: the byte offsets of the lines
+    needed to read each cell, the line range of the cell, and the cell type"""
+    _, ext = os.path.splitext(nb_file)
+    requested_fmt = fmt
+    fmt = copy(long_form_one_format(fmt or {}))
+    fmt['extension'] = ext
+
+    signature = file_signature(nb_file)
+    with io.open(nb_file, 'rb') as stream:
+        text = stream.read().decode('utf-8')
+
+    document = parsed_document(text, ext)
+    format_name = read_format_from_metadata(document, ext) or fmt.get('format_name') or guess_format(document, ext)
+    if format_name:
+        fmt['format_name'] = format_name
+
+    converter = TextNotebookConverter(fmt)
+    notebook, positions = converter.reads_with_positions(document)
+    metadata, _, _, _ = document.header(converter.implementation.header_prefix, ext)
+
+    # Byte offset of the start of each line
+    offsets = [0]
+    for line in text.splitlines(True):
+        offsets.append(offsets[-1] + len(line.encode('utf-8')))
+
+    line_types = LineTypes(document.lines)
+    cells = []
+    for cell, position in zip(notebook.cells, positions):
+        if position is None:
+            cells.append({'cell': cell})
+            continue
+        cell_start, next_cell = position
+        cells.append({'start': offsets[cell_start],
+                      'end': offsets[converter.chunk_end(document.lines, next_cell, line_types)],
+                      'lines': [cell_start, next_cell],
+                      'cell_type': cell.cell_type})
+
+    return {'jupytext_version': __version__,
+            'requested_format': requested_fmt,
+            'signature': signature,
+            'format': converter.fmt,
+            'default_language': default_language_from_metadata_and_ext(metadata, ext),
+            'main_language': main_language_from_metadata_and_ext(notebook.metadata, ext),
+            'cells': cells}
+
+
+def cell_index(nb_file, fmt=None, index_dir=None):
+    """Return the cell index of the notebook. The index is read from the index directory,
+    and rebuilt when the notebook has changed"""
+    path = index_path(nb_file, index_dir)
+    try:
+        with io.open(path, encoding='utf-8') as stream:
+            index = json.load(stream)
+        if index['jupytext_version'] == __version__ and index['requested_format'] == fmt and \
+                index['signature'] == file_signature(nb_file):
+            return index
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+
+    index = build_cell_index(nb_file, fmt)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with io.open(path, 'w', encoding='utf-8') as stream:
+            stream.write(u'' + json.dumps(index))
+    except (IOError, OSError):  # pragma: no cover
+        pass
+    return index
+
+
+def check_cell_index(nb_file, index, cell_count):
+    """Raise a ValueError if the notebook has no cell with the given index"""
+    if not -cell_count <= index < cell_count:
+        raise ValueError("Cell index {} is out of range: '{}' has {} cell(s)".format(index, nb_file, cell_count))
+
+
+def read_cell(nb_file, index, fmt=None, index_dir=None):
+    """Read the cell with the given index in the notebook. Only the lines of that
+    cell are read and decoded, using a cell index stored in the index directory"""
+    _, ext = os.path.splitext(nb_file)
+    if ext == '.ipynb':
+        cells = readf(nb_file, fmt).cells
+        check_cell_index(nb_file, index, len(cells))
+        return cells[index]
+
+    notebook_index = cell_index(nb_file, fmt, index_dir)
+    check_cell_index(nb_file, index, len(notebook_index['cells']))
+    entry = notebook_index['cells'][index]
+    if 'cell' in entry:
+        return nbformat.from_dict(entry['cell'])
+
+    with io.open(nb_file, 'rb') as stream:
+        mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            lines = mapped[entry['start']:entry['end']].decode('utf-8').splitlines()
+        finally:
+            mapped.close()
+
+    fmt = notebook_index['format']
+    implementation = get_format_implementation(ext, fmt.get('format_name'))
+    reader = implementation.cell_reader_class(fmt, notebook_index['default_language'])
+    cell, next_cell = reader.read(lines)
+
+    # The file was modified without changing its size and modification time
+    cell_start, expected_next_cell = entry['lines']
+    if next_cell != expected_next_cell - cell_start:  # pragma: no cover
+        return readf(nb_file, fmt).cells[index]
+
+    set_main_and_cell_language({'jupytext': {'main_language': notebook_index['main_language']}}, [cell], ext)
+    return cell
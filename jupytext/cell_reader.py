@@ -1,6 +1,11 @@
 """Read notebook cells from their text representation"""
 
 import re
+import hashlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import islice
+from nbformat.notebooknode import NotebookNode
 from nbformat.v4.nbbase import new_code_cell, new_raw_cell, new_markdown_cell
 from .languages import _SCRIPT_EXTENSIONS
 
@@ -15,10 +20,52 @@ from .stringparser import StringParser
 from .magics import uncomment_magic, is_magic, unescape_code_start
 from .pep8 import pep8_lines_between_cells
 
+# The Markdown conversion of the most recent reStructuredText cells, by content hash
+_RST2MD_CACHE = OrderedDict()
+_RST2MD_CACHE_SIZE = 1024
+
 _BLANK_LINE = re.compile(r"^\s*$")
 _PY_COMMENT = re.compile(r"^\s*#")
 _PY_INDENTED = re.compile(r"^\s")
 
+# Regular expressions that may match more than one line, or a line break, when applied to the full document
+_NOT_A_LINE_PATTERN = re.compile(r"\\[\\WDnrAZxuUN0-9]|\[\^|\[[^\]]*\\s|\(\?")
+
+_NEW_CELL = {'code': new_code_cell, 'markdown': new_markdown_cell, 'raw': new_raw_cell}
+
+# Do the cells created by nbformat have an id? Then they are always created by nbformat
+_NEW_CELL_HAS_ID = 'id' in new_raw_cell()
+
+
+class TextCell(object):
+    """A compact record for the cells read from a text notebook. The cells become
+    nbformat's NotebookNode only when the notebook is returned to the user"""
+    __slots__ = ('cell_type', 'source', 'metadata')
+
+    def __init__(self, cell_type, source, metadata):
+        self.cell_type = cell_type
+        self.source = source
+        self.metadata = metadata
+
+    def __getstate__(self):
+        return self.cell_type, self.source, self.metadata
+
+    def __setstate__(self, state):
+        self.cell_type, self.source, self.metadata = state
+
+    def to_notebook_node(self, validate=True):
+        """The cell as a NotebookNode, identical to the one created by new_code_cell, new_markdown_cell or
+        new_raw_cell. Use validate=False when the cell is validated as part of a notebook"""
+        if validate or _NEW_CELL_HAS_ID:
+            return _NEW_CELL[self.cell_type](source=self.source, metadata=self.metadata)
+
+        cell = NotebookNode(cell_type=self.cell_type, metadata=NotebookNode(), source=self.source)
+        if self.cell_type == 'code':
+            cell.execution_count = None
+            cell.outputs = []
+        cell.update(metadata=self.metadata)
+        return cell
+
 
 def uncomment(lines, prefix='#'):
     """Remove prefix and space, or only prefix, when possible"""
@@ -32,24 +79,135 @@ def uncomment(lines, prefix='#'):
             for line in lines]
 
 
-def paragraph_is_fully_commented(lines, comment, main_language):
-    """Is the paragraph fully commented?"""
-    for i, line in enumerate(lines):
+def whole_document_pattern(regex):
+    """The regular expression, in multiline mode, that finds the lines that match the given
+    regular expression in the whole document at once, or None when we can't be sure that
+    the matches would be the same"""
+    if regex.flags & ~re.UNICODE or _NOT_A_LINE_PATTERN.search(regex.pattern):
+        return None
+    return re.compile('^(?:{})'.format(regex.pattern.replace(r'\s', r'[^\S\n]')), re.MULTILINE)
+
+
+def rst2md_batch(texts):
+    """Convert the given reStructuredText texts to Markdown. Each distinct text is converted
+    only once, and the most recent conversions are reused from an LRU cache"""
+    if rst2md is None:
+        raise ImportError('Could not import rst2md from sphinx_gallery.notebook')
+
+    converted = []
+    for text in texts:
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        if key in _RST2MD_CACHE:
+            markdown = _RST2MD_CACHE.pop(key)
+        else:
+            markdown = rst2md(text)
+            while len(_RST2MD_CACHE) >= _RST2MD_CACHE_SIZE:
+                _RST2MD_CACHE.popitem(last=False)
+        _RST2MD_CACHE[key] = markdown
+        converted.append(markdown)
+    return converted
+
+
+def paragraph_is_fully_commented(lines, comment, main_language, start=0):
+    """Is the paragraph that starts at the given position fully commented?"""
+    for i in range(start, len(lines)):
+        line = lines[i]
         if line.startswith(comment):
             if line.startswith((comment + ' %', comment + ' ?', comment + ' !')) and is_magic(line, main_language):
                 return False
             continue
-        return i > 0 and _BLANK_LINE.match(line)
+        return i > start and _BLANK_LINE.match(line)
     return True
 
 
-def next_code_is_indented(lines):
-    """Is the next unescaped line indented?"""
-    for line in lines:
-        if _BLANK_LINE.match(line) or _PY_COMMENT.match(line):
-            continue
-        return _PY_INDENTED.match(line)
-    return False
+class LineTypes(object):
+    """A classification of the lines of a document, computed in one pass.
+    The cell readers use these tables rather than matching the same lines
+    with the same regular expressions again and again. When possible, the lines
+    that match a regular expression are found by scanning the document with a
+    multiline regular expression, rather than line by line"""
+
+    # Number of lines that are joined and scanned at once
+    block_size = 10000
+
+    def __init__(self, lines):
+        self.lines = lines
+        self._matches = {}
+        self._match_indices = {}
+        self._next_code = None
+        # Same as matching _BLANK_LINE, in a single pass
+        self.blank = [not line.strip() for line in lines]
+
+    def scan(self, pattern):
+        """The positions of the lines that match the given multiline pattern, found by scanning
+        blocks of lines at once, or None if the lines contain line breaks"""
+        indices = []
+        for first in range(0, len(self.lines), self.block_size):
+            block = self.lines[first:first + self.block_size]
+            text = '\n'.join(block)
+            if text.count('\n') + 1 != len(block):
+                return None
+            line = first
+            offset = 0
+            for match in pattern.finditer(text):
+                line += text.count('\n', offset, match.start())
+                offset = match.start()
+                indices.append(line)
+        return indices
+
+    def match_indices(self, regex):
+        """The positions of the lines that match the given regular expression"""
+        if regex.pattern not in self._match_indices:
+            pattern = whole_document_pattern(regex)
+            indices = self.scan(pattern) if pattern else None
+            if indices is None:
+                if regex.pattern not in self._matches:
+                    self._matches[regex.pattern] = [bool(regex.match(line)) for line in self.lines]
+                indices = [i for i, match in enumerate(self._matches[regex.pattern]) if match]
+            self._match_indices[regex.pattern] = indices
+        return self._match_indices[regex.pattern]
+
+    def match(self, regex):
+        """Does each line match the given regular expression?"""
+        if regex.pattern not in self._matches:
+            matches = [False] * len(self.lines)
+            for i in self.match_indices(regex):
+                matches[i] = True
+            self._matches[regex.pattern] = matches
+        return self._matches[regex.pattern]
+
+    def next_match(self, regex, start):
+        """Position of the first line that matches the regular expression, at or after start"""
+        indices = self.match_indices(regex)
+        pos = bisect_left(indices, start)
+        if pos < len(indices):
+            return indices[pos]
+        return len(self.lines)
+
+    def next_code(self, start):
+        """Position of the next line that is neither blank nor commented, at or after start"""
+        if self._next_code is None:
+            self._next_code = next_code = [len(self.lines)] * (len(self.lines) + 1)
+            comment = self.match(_PY_COMMENT)
+            for i in reversed(range(len(self.lines))):
+                if self.blank[i] or comment[i]:
+                    next_code[i] = next_code[i + 1]
+                else:
+                    next_code[i] = i
+
+        return self._next_code[min(start, len(self.lines))]
+
+    def next_code_is_indented(self, start):
+        """Is the next line that is neither blank nor commented, at or after start, indented?"""
+        next_code = self.next_code(start)
+        return next_code < len(self.lines) and bool(_PY_INDENTED.match(self.lines[next_code]))
+
+
+def lines_after(lines, pos):
+    """The lines that follow the given position, without copying them"""
+    if pos >= len(lines):
+        return []
+    return islice(lines, pos, None)
 
 
 def count_lines_to_next_cell(cell_end_marker, next_cell_start, total, explicit_eoc):
@@ -100,33 +258,31 @@ class BaseCellReader(object):
         self.explicit_eoc = None
         self.cell_type = None
         self.language = None
+        self.line_types = None
 
-    def read(self, lines):
-        """Read one cell from the given lines, and return the cell,
-        plus the position of the next cell
+    def read(self, lines, start=0, line_types=None):
+        """Read one cell from the given lines, starting at the given position,
+        and return the cell, plus the (absolute) position of the next cell.
+        Pass the LineTypes of the lines when reading more than one cell.
         """
+        cell, pos_next_cell = self.read_text_cell(lines, start, line_types)
+        return cell.to_notebook_node(), pos_next_cell
 
-        # Do we have an explicit code marker on the first line?
-        self.metadata_and_language_from_option_line(lines[0])
-
-        if self.metadata and 'language' in self.metadata:
-            self.language = self.metadata.pop('language')
+    def read_text_cell(self, lines, start=0, line_types=None):
+        """Same as read, but return the cell as a TextCell"""
+        self.read_option_line(lines, start, line_types)
 
         # Parse cell till its end and set content, lines_to_next_cell
-        pos_next_cell = self.find_cell_content(lines)
+        pos_next_cell = self.find_cell_content(lines, start)
 
-        if self.cell_type == 'code':
-            new_cell = new_code_cell
-        elif self.cell_type == 'markdown':
-            new_cell = new_markdown_cell
-        else:
-            new_cell = new_raw_cell
+        cell_type = self.cell_type if self.cell_type in ['code', 'markdown'] else 'raw'
 
         if not self.metadata:
             self.metadata = {}
 
         if self.ext == '.py' and not self.explicit_eoc:
-            expected_blank_lines = pep8_lines_between_cells(self.org_content or [''], lines[pos_next_cell:], self.ext)
+            expected_blank_lines = pep8_lines_between_cells(self.org_content or [''],
+                                                            lines_after(lines, pos_next_cell), self.ext)
         else:
             expected_blank_lines = 1
 
@@ -136,7 +292,23 @@ class BaseCellReader(object):
         if self.language:
             self.metadata['language'] = self.language
 
-        return new_cell(source='\n'.join(self.content), metadata=self.metadata), pos_next_cell
+        return TextCell(cell_type, '\n'.join(self.content), self.metadata), pos_next_cell
+
+    def is_single_cell(self, lines, line_types=None):
+        """Are the given lines read as a single cell? Only the end of the first cell
+        is searched for, the content of the cell is not read"""
+        self.read_option_line(lines, 0, line_types)
+        return self.find_cell_end(lines)[1] >= len(lines)
+
+    def read_option_line(self, lines, start=0, line_types=None):
+        """Classify the lines, and parse the code options on the first line of the cell"""
+        self.line_types = line_types or LineTypes(lines)
+
+        # Do we have an explicit code marker on the first line?
+        self.metadata_and_language_from_option_line(lines[start])
+
+        if self.metadata and 'language' in self.metadata:
+            self.language = self.metadata.pop('language')
 
     def metadata_and_language_from_option_line(self, line):
         """Parse code options on the given line. When a start of a code cell
@@ -148,7 +320,7 @@ class BaseCellReader(object):
         """Return language (str) and metadata (dict) from the option line"""
         raise NotImplementedError("Option parsing must be implemented in a sub class")
 
-    def find_code_cell_end(self, lines):
+    def find_code_cell_end(self, lines, start=0):
         """Given that this is a code cell, return position of
         end of cell marker, and position of next cell start"""
         if self.metadata and 'cell_type' in self.metadata:
@@ -156,9 +328,14 @@ class BaseCellReader(object):
         else:
             self.cell_type = 'code'
         parser = StringParser(self.language or self.default_language)
-        for i, line in enumerate(lines):
+        blank = self.line_types.blank
+        start_code = self.line_types.match(self.start_code_re)
+        simple_start_code = self.line_types.match(self.simple_start_code_re) if self.simple_start_code_re else None
+        end_code = self.line_types.match(self.end_code_re) if self.end_code_re else None
+        for i in range(start, len(lines)):
+            line = lines[i]
             # skip cell header
-            if self.metadata is not None and i == 0:
+            if self.metadata is not None and i == start:
                 continue
 
             if parser.is_quoted():
@@ -167,49 +344,54 @@ class BaseCellReader(object):
 
             parser.read_line(line)
 
-            if self.start_code_re.match(line) or (self.markdown_prefix and line.startswith(self.markdown_prefix)):
-                if i > 0 and _BLANK_LINE.match(lines[i - 1]):
-                    if i > 1 and _BLANK_LINE.match(lines[i - 2]):
+            if start_code[i] or (self.markdown_prefix and line.startswith(self.markdown_prefix)):
+                if i > start and blank[i - 1]:
+                    if i > start + 1 and blank[i - 2]:
                         return i - 2, i, False
                     return i - 1, i, False
                 return i, i, False
 
             # Simple code pattern in LightScripts must be preceded with a blank line
-            if self.simple_start_code_re and self.simple_start_code_re.match(line):
-                if i > 0 and _BLANK_LINE.match(lines[i - 1]):
-                    if i > 1 and _BLANK_LINE.match(lines[i - 2]):
+            if simple_start_code and simple_start_code[i]:
+                if i > start and blank[i - 1]:
+                    if i > start + 1 and blank[i - 2]:
                         return i - 2, i, False
                     return i - 1, i, False
 
-            if self.end_code_re:
-                if self.end_code_re.match(line):
+            if end_code:
+                if end_code[i]:
                     return i, i + 1, True
-            elif _BLANK_LINE.match(line):
-                if not next_code_is_indented(lines[i:]):
-                    if i > 0:
+            elif blank[i]:
+                if not self.line_types.next_code_is_indented(i):
+                    if i > start:
                         return i, i + 1, False
-                    if len(lines) > 1 and not _BLANK_LINE.match(lines[1]):
-                        return 1, 1, False
-                    return 1, 2, False
+                    if len(lines) > start + 1 and not blank[start + 1]:
+                        return start + 1, start + 1, False
+                    return start + 1, start + 2, False
 
         return len(lines), len(lines), False
 
-    def find_cell_end(self, lines):
+    def find_cell_end(self, lines, start=0):
         """Return position of end of cell marker, and position
         of first line after cell"""
         raise NotImplementedError('This method must be implemented in a sub class')
 
-    def find_cell_content(self, lines):
+    def find_cell_starts(self, lines, start=0, line_types=None):
+        """Return positions after start where a cell starts whatever the previous cells are.
+        Formats in which cells have no unambiguous start marker return an empty list"""
+        return []
+
+    def find_cell_content(self, lines, start=0):
         """Parse cell till its end and set content, lines_to_next_cell.
         Return the position of next cell start"""
-        cell_end_marker, next_cell_start, self.explicit_eoc = self.find_cell_end(lines)
+        cell_end_marker, next_cell_start, self.explicit_eoc = self.find_cell_end(lines, start)
 
         # Metadata to dict
         if self.metadata is None:
-            cell_start = 0
+            cell_start = start
             self.metadata = {}
         else:
-            cell_start = 1
+            cell_start = start + 1
 
         # Cell content
         source = lines[cell_start:cell_end_marker]
@@ -223,7 +405,7 @@ class BaseCellReader(object):
             else:
                 lines_to_end_of_cell_marker = 0
 
-            pep8_lines = pep8_lines_between_cells(source, lines[cell_end_marker:], self.ext)
+            pep8_lines = pep8_lines_between_cells(source, lines_after(lines, cell_end_marker), self.ext)
             if lines_to_end_of_cell_marker != (0 if pep8_lines == 1 else 2):
                 self.metadata['lines_to_end_of_cell_marker'] = lines_to_end_of_cell_marker
 
@@ -241,14 +423,15 @@ class BaseCellReader(object):
             self.cell_type = 'raw'
 
         # Explicit end of cell marker?
+        blank = self.line_types.blank
         if (next_cell_start + 1 < len(lines) and
-                _BLANK_LINE.match(lines[next_cell_start]) and
-                not _BLANK_LINE.match(lines[next_cell_start + 1])):
+                blank[next_cell_start] and
+                not blank[next_cell_start + 1]):
             next_cell_start += 1
         elif (self.explicit_eoc and next_cell_start + 2 < len(lines) and
-              _BLANK_LINE.match(lines[next_cell_start]) and
-              _BLANK_LINE.match(lines[next_cell_start + 1]) and
-              not _BLANK_LINE.match(lines[next_cell_start + 2])):
+              blank[next_cell_start] and
+              blank[next_cell_start + 1] and
+              not blank[next_cell_start + 2]):
             next_cell_start += 2
 
         self.lines_to_next_cell = count_lines_to_next_cell(
@@ -278,34 +461,48 @@ class MarkdownCellReader(BaseCellReader):
     def options_to_metadata(self, options):
         return md_options_to_metadata(options)
 
-    def find_cell_end(self, lines):
+    def find_cell_starts(self, lines, start=0, line_types=None):
+        """Return the positions of the code cells: start of code markers outside of code cells"""
+        line_types = line_types or LineTypes(lines)
+        cell_starts = []
+        pos = line_types.next_match(self.start_code_re, start)
+        while pos < len(lines):
+            if pos > start:
+                cell_starts.append(pos)
+            pos = line_types.next_match(self.end_code_re, pos + 1)
+            if pos >= len(lines):
+                break
+            pos = line_types.next_match(self.start_code_re, pos + 1)
+        return cell_starts
+
+    def find_cell_end(self, lines, start=0):
         """Return position of end of cell marker, and position
         of first line after cell"""
         # markdown: (last) two consecutive blank lines
         if self.metadata is None:
             self.cell_type = 'markdown'
+            blank = self.line_types.blank
+            next_code_cell = self.line_types.next_match(self.start_code_re, start)
             prev_blank = 0
-            for i, line in enumerate(lines):
-                if self.start_code_re.match(line):
-                    if i > 1 and prev_blank:
-                        return i - 1, i, False
-                    return i, i, False
-                if self.split_at_heading and line.startswith('#') and prev_blank >= 1:
+            for i in range(start, next_code_cell):
+                if self.split_at_heading and lines[i].startswith('#') and prev_blank >= 1:
                     return i - 1, i, False
-                if _BLANK_LINE.match(lines[i]):
+                if blank[i]:
                     prev_blank += 1
-                elif i > 2 and prev_blank >= 2:
+                elif i > start + 2 and prev_blank >= 2:
                     return i - 2, i, True
                 else:
                     prev_blank = 0
+            if next_code_cell < len(lines):
+                if next_code_cell > start + 1 and prev_blank:
+                    return next_code_cell - 1, next_code_cell, False
+                return next_code_cell, next_code_cell, False
         else:
             self.cell_type = 'code'
-            for i, line in enumerate(lines):
-                # skip cell header
-                if i == 0:
-                    continue
-                if self.end_code_re.match(line):
-                    return i, i + 1, True
+            # skip cell header
+            i = self.line_types.next_match(self.end_code_re, start + 1)
+            if i < len(lines):
+                return i, i + 1, True
 
         # End not found
         return len(lines), len(lines), False
@@ -370,20 +567,20 @@ class RScriptCellReader(ScriptCellReader):
     def options_to_metadata(self, options):
         return rmd_options_to_metadata('r ' + options)
 
-    def find_cell_end(self, lines):
+    def find_cell_end(self, lines, start=0):
         """Return position of end of cell marker, and position
         of first line after cell"""
-        if self.metadata is None and lines[0].startswith("#'"):
+        if self.metadata is None and lines[start].startswith("#'"):
             self.cell_type = 'markdown'
-            for i, line in enumerate(lines):
-                if not line.startswith("#'"):
-                    if _BLANK_LINE.match(line):
+            for i in range(start, len(lines)):
+                if not lines[i].startswith("#'"):
+                    if self.line_types.blank[i]:
                         return i, i + 1, False
                     return i, i, False
 
             return len(lines), len(lines), False
 
-        return self.find_code_cell_end(lines)
+        return self.find_code_cell_end(lines, start)
 
 
 class LightScriptCellReader(ScriptCellReader):
@@ -413,13 +610,14 @@ class LightScriptCellReader(ScriptCellReader):
         if self.metadata is not None:
             self.language = self.metadata.get('language', self.default_language)
 
-    def find_cell_end(self, lines):
+    def find_cell_end(self, lines, start=0):
         """Return position of end of cell marker, and position
         of first line after cell"""
-        if self.metadata is None and paragraph_is_fully_commented(lines, self.comment, self.default_language):
+        if self.metadata is None and paragraph_is_fully_commented(lines, self.comment, self.default_language, start):
             self.cell_type = 'markdown'
-            for i, line in enumerate(lines):
-                if _BLANK_LINE.match(line):
+            blank = self.line_types.blank
+            for i in range(start, len(lines)):
+                if blank[i]:
                     return i, i + 1, False
             return len(lines), len(lines), False
 
@@ -427,7 +625,7 @@ class LightScriptCellReader(ScriptCellReader):
             end_of_cell = self.metadata.get('endofcell', '-')
             self.end_code_re = re.compile('^' + self.comment + ' ' + end_of_cell + r'\s*$')
 
-        return self.find_code_cell_end(lines)
+        return self.find_code_cell_end(lines, start)
 
 
 class DoublePercentScriptCellReader(ScriptCellReader):
@@ -441,6 +639,9 @@ class DoublePercentScriptCellReader(ScriptCellReader):
         self.comment = script['comment']
         self.start_code_re = re.compile(r"^{}\s*%%(%*)\s(.*)$".format(self.comment))
         self.alternative_start_code_re = re.compile(r"^{}\s*(%%|<codecell>|In\[[0-9 ]*\]:?)\s*$".format(self.comment))
+        # Any of the two cell markers, found with a single scan of the document
+        self.cell_marker_re = re.compile('{}|{}'.format(self.start_code_re.pattern,
+                                                        self.alternative_start_code_re.pattern))
 
     def metadata_and_language_from_option_line(self, line):
         """Parse code options on the given line. When a start of a code cell
@@ -453,16 +654,22 @@ class DoublePercentScriptCellReader(ScriptCellReader):
     def options_to_metadata(self, options):
         return None, double_percent_options_to_metadata(options)
 
-    def find_cell_content(self, lines):
+    def find_cell_starts(self, lines, start=0, line_types=None):
+        """Return the positions of the cell markers"""
+        line_types = line_types or LineTypes(lines)
+        cell_markers = line_types.match_indices(self.cell_marker_re)
+        return cell_markers[bisect_right(cell_markers, start):]
+
+    def find_cell_content(self, lines, start=0):
         """Parse cell till its end and set content, lines_to_next_cell.
         Return the position of next cell start"""
-        cell_end_marker, next_cell_start, explicit_eoc = self.find_cell_end(lines)
+        cell_end_marker, next_cell_start, explicit_eoc = self.find_cell_end(lines, start)
 
         # Metadata to dict
-        if self.start_code_re.match(lines[0]) or self.alternative_start_code_re.match(lines[0]):
-            cell_start = 1
+        if self.start_code_re.match(lines[start]) or self.alternative_start_code_re.match(lines[start]):
+            cell_start = start + 1
         else:
-            cell_start = 0
+            cell_start = start
 
         # Cell content
         source = lines[cell_start:cell_end_marker]
@@ -484,7 +691,7 @@ class DoublePercentScriptCellReader(ScriptCellReader):
 
         return next_cell_start
 
-    def find_cell_end(self, lines):
+    def find_cell_end(self, lines, start=0):
         """Return position of end of cell marker, and position
         of first line after cell"""
 
@@ -493,15 +700,12 @@ class DoublePercentScriptCellReader(ScriptCellReader):
         else:
             self.cell_type = 'code'
 
-        next_cell = len(lines)
-        for i, line in enumerate(lines):
-            if i > 0 and (self.start_code_re.match(line) or self.alternative_start_code_re.match(line)):
-                next_cell = i
-                break
+        next_cell = self.line_types.next_match(self.cell_marker_re, start + 1)
 
-        if last_two_lines_blank(lines[:next_cell]):
+        blank = self.line_types.blank
+        if next_cell > start + 2 and blank[next_cell - 1] and blank[next_cell - 2] and not blank[next_cell - 3]:
             return next_cell - 2, next_cell, False
-        if next_cell > 0 and _BLANK_LINE.match(lines[next_cell - 1]):
+        if next_cell > start and blank[next_cell - 1]:
             return next_cell - 1, next_cell, False
         return next_cell, next_cell, False
 
@@ -551,7 +755,7 @@ class SphinxGalleryScriptCellReader(ScriptCellReader):  # pylint: disable=W0223
         else:
             self.cell_type = 'code'
 
-    def find_cell_end(self, lines):
+    def find_cell_end(self, lines, start=0):
         """Return position of end of cell, and position
         of first line after cell, and whether there was an
         explicit end of cell marker"""
@@ -559,70 +763,77 @@ class SphinxGalleryScriptCellReader(ScriptCellReader):  # pylint: disable=W0223
         if self.cell_type == 'markdown':
             # Empty cell "" or ''
             if len(self.markdown_marker) <= 2:
-                if len(lines) == 1 or _BLANK_LINE.match(lines[1]):
-                    return 0, 2, True
-                return 0, 1, True
+                if len(lines) == start + 1 or self.line_types.blank[start + 1]:
+                    return start, start + 2, True
+                return start, start + 1, True
 
             # Multi-line comment with triple quote
             if len(self.markdown_marker) == 3:
-                for i, line in enumerate(lines):
-                    if (i > 0 or line.strip() != self.markdown_marker) and line.rstrip().endswith(self.markdown_marker):
+                for i in range(start, len(lines)):
+                    line = lines[i]
+                    if (i > start or line.strip() != self.markdown_marker) and \
+                            line.rstrip().endswith(self.markdown_marker):
                         explicit_end_of_cell_marker = line.strip() == self.markdown_marker
                         if explicit_end_of_cell_marker:
                             end_of_cell = i
                         else:
                             end_of_cell = i + 1
-                        if len(lines) <= i + 1 or _BLANK_LINE.match(
-                                lines[i + 1]):
+                        if len(lines) <= i + 1 or self.line_types.blank[i + 1]:
                             return end_of_cell, i + 2, explicit_end_of_cell_marker
                         return end_of_cell, i + 1, explicit_end_of_cell_marker
             else:
                 # 20 # or more
-                for i, line in enumerate(lines[1:], 1):
+                for i in range(start + 1, len(lines)):
+                    line = lines[i]
                     if not line.startswith(self.comment):
-                        if _BLANK_LINE.match(line):
+                        if self.line_types.blank[i]:
                             return i, i + 1, False
                         return i, i, False
 
         elif self.cell_type == 'code':
             parser = StringParser('python')
-            for i, line in enumerate(lines):
+            for i in range(start, len(lines)):
+                line = lines[i]
                 if parser.is_quoted():
                     parser.read_line(line)
                     continue
 
                 if self.start_of_new_markdown_cell(line):
-                    if i > 0 and _BLANK_LINE.match(lines[i - 1]):
+                    if i > start and self.line_types.blank[i - 1]:
                         return i - 1, i, False
                     return i, i, False
                 parser.read_line(line)
 
         return len(lines), len(lines), False
 
-    def find_cell_content(self, lines):
+    def find_cell_content(self, lines, start=0):
         """Parse cell till its end and set content, lines_to_next_cell.
         Return the position of next cell start"""
-        cell_end_marker, next_cell_start, explicit_eoc = self.find_cell_end(lines)
+        cell_end_marker, next_cell_start, explicit_eoc = self.find_cell_end(lines, start)
 
         # Metadata to dict
-        cell_start = 0
+        cell_start = start
+        remove_triple_quotes = False
         if self.cell_type == 'markdown':
             if self.markdown_marker in ['"""', "'''"]:
-                # Remove the triple quotes
-                if lines[0].strip() == self.markdown_marker:
-                    cell_start = 1
-                else:
-                    lines[0] = lines[0][3:]
-                if not explicit_eoc:
-                    last = lines[cell_end_marker - 1]
-                    lines[cell_end_marker - 1] = last[:last.rfind(self.markdown_marker)]
+                remove_triple_quotes = True
+                if lines[start].strip() == self.markdown_marker:
+                    cell_start = start + 1
             if self.twenty_hash.match(self.markdown_marker):
-                cell_start = 1
+                cell_start = start + 1
         else:
             self.metadata = {}
 
         # Cell content
         source = lines[cell_start:cell_end_marker]
+
+        # Remove the triple quotes (on the cell copy, as lines are shared with the next cells)
+        if remove_triple_quotes:
+            if cell_start == start:
+                source[0] = source[0][3:]
+            if not explicit_eoc:
+                source[-1] = source[-1][:source[-1].rfind(self.markdown_marker)]
+
         self.org_content = [line for line in source]
 
         if self.cell_type == 'code' and self.comment_magics:
@@ -632,10 +843,7 @@ class SphinxGalleryScriptCellReader(ScriptCellReader):  # pylint: disable=W0223
             if self.markdown_marker.startswith(self.comment):
                 source = uncomment(source, self.comment)
             if self.rst2md:
-                if rst2md:
-                    source = rst2md('\n'.join(source)).splitlines()
-                else:
-                    raise ImportError('Could not import rst2md from sphinx_gallery.notebook')
+                source = rst2md_batch(['\n'.join(source)])[0].splitlines()
 
         self.content = source
 
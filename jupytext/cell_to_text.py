@@ -1,11 +1,13 @@
 """Export notebook cells as text"""
 
-import re
+import json
+import hashlib
 from copy import copy
+from collections import OrderedDict
 from .languages import cell_language, comment_lines
 from .cell_metadata import is_active, _IGNORE_CELL_METADATA
 from .cell_metadata import metadata_to_rmd_options, metadata_to_json_options, metadata_to_double_percent_options
-from .metadata_filter import filter_metadata
+from .metadata_filter import compile_metadata_filter
 from .magics import comment_magic, escape_code_start
 from .cell_reader import LightScriptCellReader
 from .languages import _SCRIPT_EXTENSIONS
@@ -22,21 +24,48 @@ def cell_source(cell):
     return source.splitlines()
 
 
+class CellAnalysis(object):
+    """The analysis of the cells that does not depend on the text format: the source lines, the language
+    and the arguments of the cell magics, and the filtered metadata. When a notebook is written in
+    several formats, the exporters of all the formats share the same analysis. The source lines and the
+    metadata are shared, and should not be modified"""
+
+    def __init__(self):
+        self.sources = {}
+        self.metadata = {}
+
+    def source_and_language(self, cell, parse_cell_language=True):
+        """The source lines of the cell, and the language and the arguments of the cell magic, if any"""
+        key = id(cell), parse_cell_language
+        if key not in self.sources or self.sources[key][0] is not cell:
+            source = cell_source(cell)
+            language, magic_args = cell_language(source) if parse_cell_language else (None, None)
+            self.sources[key] = cell, (source, language, magic_args)
+        return self.sources[key][1]
+
+    def filtered_metadata(self, cell, cell_metadata_filter=None):
+        """The cell metadata, filtered with the given filter"""
+        key = id(cell), repr(cell_metadata_filter)
+        if key not in self.metadata or self.metadata[key][0] is not cell:
+            metadata_filter = compile_metadata_filter(cell_metadata_filter, _IGNORE_CELL_METADATA)
+            metadata = metadata_filter.filter(copy(cell.metadata))
+            self.metadata[key] = cell, metadata
+        return self.metadata[key][1]
+
+
 class BaseCellExporter(object):
     """A class that represent a notebook cell as text"""
     default_comment_magics = None
     parse_cell_language = True
 
-    def __init__(self, cell, default_language, fmt=None):
+    def __init__(self, cell, default_language, fmt=None, analysis=None):
         self.fmt = fmt or {}
         self.ext = self.fmt.get('extension')
         self.cell_type = cell.cell_type
-        self.source = cell_source(cell)
+        analysis = analysis or CellAnalysis()
+        self.source, self.language, magic_args = analysis.source_and_language(cell, self.parse_cell_language)
         self.unfiltered_metadata = cell.metadata
-        self.metadata = filter_metadata(copy(cell.metadata),
-                                        self.fmt.get('cell_metadata_filter'),
-                                        _IGNORE_CELL_METADATA)
-        self.language, magic_args = cell_language(self.source) if self.parse_cell_language else (None, None)
+        self.metadata = copy(analysis.filtered_metadata(cell, self.fmt.get('cell_metadata_filter')))
 
         if self.language:
             if magic_args:
@@ -74,8 +103,9 @@ class BaseCellExporter(object):
         if self.is_code():
             return self.code_to_text()
 
-        source = copy(self.source)
+        source = self.source
         if not self.comment:
+            source = copy(source)
             escape_code_start(source, self.ext, None)
         return self.markdown_to_text(source)
 
@@ -102,6 +132,62 @@ class BaseCellExporter(object):
         return text
 
 
+class CellTextCache(object):
+    """A LRU cache of the text of the cells, as returned by the cell exporters. The cells are identified by
+    the exporter class, the cell type and language, the source and filtered metadata (in order, as the order
+    of the cell options depends on it), the format options and the default language. Blank lines and markers
+    that depend on the neighbouring cells are not cached"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """Remove all the entries, and reset the counters"""
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(exporter):
+        """The key of the cell in the cache, or None when the cell cannot be cached"""
+        try:
+            description = json.dumps([type(exporter).__name__, exporter.cell_type, exporter.language, exporter.source,
+                                      exporter.metadata, exporter.fmt, exporter.default_language])
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+    def cell_to_text(self, exporter):
+        """Return the text of the cell, and leave the exporter in the state that cell_to_text would have"""
+        key = self.key(exporter) if self.maxsize else None
+        if key is None:
+            return exporter.cell_to_text()
+
+        if key in self.entries:
+            self.hits += 1
+            text, metadata, source = self.entries.pop(key)
+        else:
+            self.misses += 1
+            text = exporter.cell_to_text()
+            text, metadata, source = copy(text), copy(exporter.metadata), copy(exporter.source)
+            while len(self.entries) >= self.maxsize:
+                self.entries.popitem(last=False)
+        self.entries[key] = text, metadata, source
+
+        exporter.metadata = copy(metadata)
+        exporter.source = copy(source)
+        return copy(text)
+
+
+CELL_TEXT_CACHE = CellTextCache()
+
+
 class MarkdownCellExporter(BaseCellExporter):
     """A class that represent a notebook cell as Markdown"""
     default_comment_magics = False
@@ -155,14 +241,21 @@ class RMarkdownCellExporter(BaseCellExporter):
 
 def endofcell_marker(source, comment):
     """Issues #31 #38:  does the cell contain a blank line? In that case
-    we add an end-of-cell marker"""
-    endofcell = '-'
-    while True:
-        endofcell_re = re.compile(r'^{}( )'.format(comment) + endofcell + r'\s*$')
-        if list(filter(endofcell_re.match, source)):
-            endofcell = endofcell + '-'
-        else:
-            return endofcell
+    we add an end-of-cell marker. The marker is the shortest run of dashes
+    that is not already on a commented line of the cell: the lengths of
+    the conflicting runs are collected in a single scan of the cell"""
+    prefix = comment + ' '
+    dash_runs = set()
+    for line in source:
+        if line.startswith(prefix):
+            dashes = line[len(prefix):].rstrip()
+            if dashes and not dashes.strip('-'):
+                dash_runs.add(len(dashes))
+
+    length = 1
+    while length in dash_runs:
+        length += 1
+    return '-' * length
 
 
 class LightScriptCellExporter(BaseCellExporter):
@@ -221,12 +314,11 @@ class LightScriptCellExporter(BaseCellExporter):
             return False
         if self.metadata:
             return True
-        if all([line.startswith(self.comment) for line in self.source]):
-            return True
-        if LightScriptCellReader(self.fmt).read(source)[1] < len(source):
+        if all(line.startswith(self.comment) for line in self.source):
             return True
 
-        return False
+        # Would the cell be split in more than one cell when read?
+        return not LightScriptCellReader(self.fmt).is_single_cell(source)
 
     def remove_eoc_marker(self, text, next_text):
         """Remove end of cell marker when next cell has an explicit start marker"""
@@ -7,9 +7,10 @@ import subprocess
 import argparse
 import json
 from copy import copy
-from .jupytext import readf, reads, writef, writes
+from .jupytext import readf, reads, writef, writes, read_metadata, MultiFormatWriter, UNCHANGED_FILE_POLICIES
 from .formats import _VALID_FORMAT_OPTIONS, _BINARY_FORMAT_OPTIONS, check_file_version
 from .formats import long_form_one_format, long_form_multiple_formats, short_form_one_format
+from .cell_index import read_cell
 from .paired_paths import paired_paths, base_path, full_path, InconsistentPath
 from .combine import combine_inputs_with_outputs
 from .compare import test_round_trip_conversion, NotebookDifference
@@ -82,6 +83,12 @@ def parse_jupytext_args(args=None):
     parser.add_argument('--update', action='store_true',
                         help='Preserve the output cells when the destination notebook is a .ipynb file '
                              'that already exists')
+    parser.add_argument('--if-unchanged',
+                        choices=UNCHANGED_FILE_POLICIES,
+                        default='write',
+                        help="What to do with the destination files that already have the new content: write them "
+                             "again (default), only update their modification time ('touch', which preserves the "
+                             "order of the paired files used by --sync), or leave them untouched ('skip')")
 
     # Action: convert(default)/version/list paired paths/sync/apply/test
     action = parser.add_mutually_exclusive_group()
@@ -91,6 +98,11 @@ def parse_jupytext_args(args=None):
     action.add_argument('--paired-paths', '-p',
                         help='List the locations of the alternative representations for this notebook.',
                         action='store_true')
+    action.add_argument('--cell',
+                        type=int,
+                        help='Print the source of the cell with the given index (0 for the first cell). Only the '
+                             'lines of that cell are read, using an index of the cells stored in the jupytext '
+                             'cache directory, which is updated when the notebook changes.')
     action.add_argument('--sync', '-s',
                         help='Synchronize the content of the paired representations of the given notebook. '
                              'Input cells are taken from the file that was last modified, and outputs are read '
@@ -163,10 +175,13 @@ def jupytext(args=None):
         for nb_file in args.notebooks:
             log(nb_file)
 
-    def writef_git_add(notebook_, nb_file_, fmt_):
+    def writef_git_add(notebook_, nb_file_, fmt_, writer=None):
         if args.pre_commit:
             system('git', 'add', nb_file)
-        writef(notebook_, nb_file_, fmt_)
+        if writer is not None:
+            writer.writef(nb_file_, fmt_, args.if_unchanged)
+        else:
+            writef(notebook_, nb_file_, fmt_, args.if_unchanged)
 
     # Read notebook from stdin
     if not args.notebooks:
@@ -184,6 +199,16 @@ def jupytext(args=None):
         print_paired_paths(args.notebooks[0], args.input_format)
         return
 
+    if args.cell is not None:
+        if len(args.notebooks) != 1:
+            raise ValueError('--cell applies to a single notebook')
+        if args.notebooks[0] == '-':
+            raise ValueError('--cell applies to a notebook file, not to stdin')
+        if args.cell < 0:
+            raise ValueError('--cell expects a non-negative index (0 for the first cell)')
+        sys.stdout.write(read_cell(args.notebooks[0], args.cell, args.input_format).source + '\n')
+        return
+
     if not args.to and not args.output and not args.sync \
             and not args.pipe and not args.check \
             and not args.test and not args.test_strict \
@@ -224,7 +249,11 @@ def jupytext(args=None):
             nb_file if nb_file != '-' else 'stdin',
             ' in format {}'.format(short_form_one_format(fmt)) if 'extension' in fmt else ''))
 
-        notebook = readf(nb_file, fmt)
+        # Text to text conversions do not need the cells as NotebookNode
+        text_to_text = nb_dest and not args.sync and not args.pipe and not args.check and not args.test \
+            and not args.test_strict and not args.update_metadata and not nb_file.endswith('.ipynb') \
+            and not nb_dest.endswith('.ipynb') and (args.to or {}).get('extension') != '.ipynb'
+        notebook = readf(nb_file, fmt, records=text_to_text)
         if not fmt:
             text_representation = notebook.metadata.get('jupytext', {}).get('text_representation', {})
             ext = os.path.splitext(nb_file)[1]
@@ -301,6 +330,8 @@ def jupytext(args=None):
             if modified:
                 inputs_nb_file = outputs_nb_file = None
             formats = notebook.metadata['jupytext']['formats']
+            # The cells are analysed only once for all the paired formats
+            writer = MultiFormatWriter(notebook)
 
             for ipynb in [True, False]:
                 # Write first format last so that it is the most recent file
@@ -313,7 +344,7 @@ def jupytext(args=None):
                     if alt_path == inputs_nb_file and alt_path == outputs_nb_file:
                         continue
                     log("[jupytext] Updating '{}'".format(alt_path))
-                    writef_git_add(notebook, alt_path, alt_fmt)
+                    writef_git_add(notebook, alt_path, alt_fmt, writer)
 
     if round_trip_conversion_errors:
         exit(round_trip_conversion_errors)
@@ -338,8 +369,7 @@ def notebooks_in_git_index(fmt):
 
 def print_paired_paths(nb_file, fmt):
     """Display the paired paths for this notebook"""
-    notebook = readf(nb_file, fmt)
-    formats = notebook.metadata.get('jupytext', {}).get('formats')
+    formats = read_metadata(nb_file).get('jupytext', {}).get('formats')
     if formats:
         for path, _ in paired_paths(nb_file, fmt, formats):
             if path != nb_file:
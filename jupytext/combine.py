@@ -4,7 +4,7 @@ import re
 from copy import copy
 from .cell_metadata import _IGNORE_CELL_METADATA, _JUPYTEXT_CELL_METADATA
 from .header import _DEFAULT_NOTEBOOK_METADATA
-from .metadata_filter import filter_metadata
+from .metadata_filter import compile_metadata_filter
 from .formats import long_form_one_format
 
 _BLANK_LINE = re.compile(r'^\s*$')
@@ -37,9 +37,8 @@ def combine_inputs_with_outputs(nb_source, nb_outputs, fmt=None):
     format_name = fmt.get('format_name')
 
     nb_outputs_filtered_metadata = copy(nb_outputs.metadata)
-    filter_metadata(nb_outputs_filtered_metadata,
-                    nb_source.metadata.get('jupytext', {}).get('notebook_metadata_filter'),
-                    _DEFAULT_NOTEBOOK_METADATA)
+    compile_metadata_filter(nb_source.metadata.get('jupytext', {}).get('notebook_metadata_filter'),
+                            _DEFAULT_NOTEBOOK_METADATA).filter(nb_outputs_filtered_metadata)
 
     for key in nb_outputs.metadata:
         if key not in nb_outputs_filtered_metadata:
@@ -51,6 +50,10 @@ def combine_inputs_with_outputs(nb_source, nb_outputs, fmt=None):
     if not nb_source.metadata.get('jupytext', {}):
         nb_source.metadata.pop('jupytext', {})
 
+    # The cell metadata filter is compiled once for all the cells
+    cell_metadata_filter = compile_metadata_filter(nb_source.metadata.get('jupytext', {}).get('cell_metadata_filter'),
+                                                   _IGNORE_CELL_METADATA)
+
     for cell in nb_source.cells:
         # Remove outputs to warranty that trust of returned notebook is that of second notebook
         if cell.cell_type == 'code':
@@ -67,10 +70,7 @@ def combine_inputs_with_outputs(nb_source, nb_outputs, fmt=None):
                     if (ext and ext.endswith('.md')) or format_name in ['bare', 'sphinx']:
                         ocell_filtered_metadata = {}
                     else:
-                        ocell_filtered_metadata = copy(ocell.metadata)
-                        filter_metadata(ocell_filtered_metadata,
-                                        nb_source.metadata.get('jupytext', {}).get('cell_metadata_filter'),
-                                        _IGNORE_CELL_METADATA)
+                        ocell_filtered_metadata = cell_metadata_filter.filter(copy(ocell.metadata))
 
                     for key in ocell.metadata:
                         if key not in ocell_filtered_metadata and key not in _JUPYTEXT_CELL_METADATA:
@@ -85,10 +85,7 @@ def combine_inputs_with_outputs(nb_source, nb_outputs, fmt=None):
                             or format_name in ['spin', 'bare', 'sphinx', 'sphinx']:
                         ocell_filtered_metadata = {}
                     else:
-                        ocell_filtered_metadata = copy(ocell.metadata)
-                        filter_metadata(ocell_filtered_metadata,
-                                        nb_source.metadata.get('jupytext', {}).get('cell_metadata_filter'),
-                                        _IGNORE_CELL_METADATA)
+                        ocell_filtered_metadata = cell_metadata_filter.filter(copy(ocell.metadata))
 
                     for key in ocell.metadata:
                         if key not in ocell_filtered_metadata:
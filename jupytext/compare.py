@@ -5,7 +5,7 @@ from copy import copy
 from testfixtures import compare
 from .cell_metadata import _IGNORE_CELL_METADATA
 from .header import _DEFAULT_NOTEBOOK_METADATA
-from .metadata_filter import filter_metadata
+from .metadata_filter import compile_metadata_filter
 from .jupytext import reads, writes
 from .combine import combine_inputs_with_outputs
 from .formats import long_form_one_format
@@ -14,9 +14,8 @@ _BLANK_LINE = re.compile(r'^\s*$')
 
 
 def filtered_cell(cell, preserve_outputs, cell_metadata_filter):
-    """Cell type, metadata and source from given cell"""
-    metadata = copy(cell.metadata)
-    filter_metadata(metadata, cell_metadata_filter, _IGNORE_CELL_METADATA)
+    """Cell type, metadata and source from given cell, with the given (compiled) cell metadata filter"""
+    metadata = cell_metadata_filter.filter(copy(cell.metadata))
 
     filtered = {'cell_type': cell.cell_type,
                 'source': cell.source,
@@ -33,9 +32,8 @@ def filtered_cell(cell, preserve_outputs, cell_metadata_filter):
 def filtered_notebook_metadata(notebook):
     """Notebook metadata, filtered for metadata added by Jupytext itself"""
     metadata = copy(notebook.metadata)
-    metadata = filter_metadata(metadata,
-                               notebook.metadata.get('jupytext', {}).get('notebook_metadata_filter'),
-                               _DEFAULT_NOTEBOOK_METADATA)
+    metadata = compile_metadata_filter(notebook.metadata.get('jupytext', {}).get('notebook_metadata_filter'),
+                                       _DEFAULT_NOTEBOOK_METADATA).filter(metadata)
     if 'jupytext' in metadata:
         del metadata['jupytext']
     return metadata
@@ -87,7 +85,8 @@ def compare_notebooks(notebook_expected,
                                                                            or format_name in ['sphinx', 'spin'])
     allow_removed_final_blank_line = allow_expected_differences
 
-    cell_metadata_filter = notebook_actual.get('jupytext', {}).get('cell_metadata_filter')
+    cell_metadata_filter = compile_metadata_filter(notebook_actual.get('jupytext', {}).get('cell_metadata_filter'),
+                                                   _IGNORE_CELL_METADATA)
 
     if format_name == 'sphinx' and notebook_actual.cells and notebook_actual.cells[0].source == '%matplotlib inline':
         notebook_actual.cells = notebook_actual.cells[1:]
@@ -1,6 +1,7 @@
 """ContentsManager that allows to open Rmd, py, R and ipynb files as notebooks
 """
 import os
+from collections import OrderedDict
 from datetime import timedelta
 import nbformat
 import mock
@@ -18,12 +19,13 @@ from notebook.services.contents.filemanager import FileContentsManager
 from jupyter_client.kernelspec import find_kernel_specs, get_kernel_spec
 
 import jupytext
-from .jupytext import create_prefix_dir
+from .jupytext import create_prefix_dir, MultiFormatWriter, elide_unchanged_write, UNCHANGED_FILE_POLICIES
 from .combine import combine_inputs_with_outputs
-from .formats import rearrange_jupytext_metadata, check_file_version
+from .formats import rearrange_jupytext_metadata, check_file_version, read_format_from_metadata, guess_format
 from .formats import NOTEBOOK_EXTENSIONS, long_form_one_format, long_form_multiple_formats
 from .formats import short_form_one_format, short_form_multiple_formats
 from .paired_paths import paired_paths, find_base_path_and_format, base_path, full_path, InconsistentPath
+from .header import parsed_document
 
 
 def kernelspec_from_language(language):
@@ -56,18 +58,68 @@ def preferred_format(incomplete_format, preferred_formats):
     return incomplete_format
 
 
-def _jupytext_writes(fmt):
+def _jupytext_writes(fmt, writer=None):
     def _writes(nbk, version=nbformat.NO_CONVERT, **kwargs):
+        if writer is not None:
+            return writer.writes(nbk, fmt, version=version, **kwargs)
         return jupytext.writes(nbk, fmt, version=version, **kwargs)
 
     return _writes
 
 
-def _jupytext_reads(fmt):
-    def _reads(text, as_version, **kwargs):
-        return jupytext.reads(text, fmt, as_version=as_version, **kwargs)
+class PairedFormatsWriter(object):
+    """Write the paired formats of a notebook with a MultiFormatWriter, so that the cells are
+    analysed only once for all the formats. The writer is created from the notebook passed
+    by the contents manager, after the pre-save hook, and is reused while that notebook is unchanged"""
 
-    return _reads
+    def __init__(self):
+        self.writer = None
+
+    def writes(self, nbk, fmt, version=nbformat.NO_CONVERT, **kwargs):
+        """Return the notebook in the given format, as a string"""
+        if self.writer is None or (self.writer.notebook is not nbk and self.writer.notebook != nbk):
+            self.writer = MultiFormatWriter(nbk)
+        return self.writer.writes(fmt, version=version, **kwargs)
+
+
+class NotebookFormatCache(object):
+    """The format of the text notebooks read by the contents manager, by path, size and modification
+    time of the file, and requested format name. The least recently used entries are dropped first"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(os_path, fmt):
+        """The cache key for the file, read in the given format"""
+        info = os.stat(os_path)
+        return os_path, info.st_size, getattr(info, 'st_mtime_ns', info.st_mtime), fmt.get('format_name')
+
+    def format_name(self, key, document, fmt):
+        """The format name of the document, from the cache or from its metadata and content"""
+        if key in self.entries:
+            self.hits += 1
+            format_name = self.entries.pop(key)
+        else:
+            self.misses += 1
+            ext = fmt['extension']
+            format_name = read_format_from_metadata(document, ext) or fmt.get('format_name') or \
+                guess_format(document, ext)
+            while len(self.entries) >= self.maxsize:
+                self.entries.popitem(last=False)
+        self.entries[key] = format_name
+        return format_name
+
+    def invalidate(self, os_path):
+        """Remove the entries for that file"""
+        for key in [key for key in self.entries if key[0] == os_path]:
+            del self.entries[key]
 
 
 class TextFileContentsManager(FileContentsManager, Configurable):
@@ -142,6 +194,14 @@ class TextFileContentsManager(FileContentsManager, Configurable):
         help='When opening a Sphinx Gallery script, convert the reStructuredText to markdown',
         config=True)
 
+    if_unchanged = Enum(
+        values=UNCHANGED_FILE_POLICIES,
+        default_value='write',
+        help="What to do with the notebook files that already have the content to be saved: write them again "
+             "(default), only update their modification time ('touch', which preserves the order of the paired "
+             "files), or leave them untouched ('skip')",
+        config=True)
+
     outdated_text_notebook_margin = Float(
         1.0,
         help='Refuse to overwrite inputs of a ipynb notebooks with those of a '
@@ -149,6 +209,33 @@ class TextFileContentsManager(FileContentsManager, Configurable):
              'the ipynb notebook',
         config=True)
 
+    def __init__(self, *args, **kwargs):
+        super(TextFileContentsManager, self).__init__(*args, **kwargs)
+        self.format_cache = NotebookFormatCache()
+
+    def _cached_format_reads(self, os_path, fmt):
+        """nbformat.reads for the text notebook at os_path, that looks for its format in the format cache"""
+
+        def _reads(text, as_version, **kwargs):
+            document = parsed_document(text, fmt['extension'])
+            try:
+                key = self.format_cache.key(os_path, fmt)
+            except (IOError, OSError):  # pragma: no cover
+                return jupytext.reads(document, fmt, as_version=as_version, **kwargs)
+
+            misses = self.format_cache.misses
+            format_name = self.format_cache.format_name(key, document, fmt)
+            log = self.log.info if self.format_cache.misses > misses else self.log.debug
+            log("Format of %s is %s (format cache: %d hits, %d misses)", os.path.basename(os_path), format_name,
+                self.format_cache.hits, self.format_cache.misses)
+
+            fmt_with_name = dict(fmt)
+            if format_name:
+                fmt_with_name['format_name'] = format_name
+            return jupytext.reads(document, fmt_with_name, as_version=as_version, **kwargs)
+
+        return _reads
+
     def drop_paired_notebook(self, path):
         """Remove the current notebook from the list of paired notebooks"""
         if path not in self.paired_notebooks:
@@ -207,6 +294,23 @@ class TextFileContentsManager(FileContentsManager, Configurable):
         """Create the prefix dir, if missing"""
         create_prefix_dir(self._get_os_path(path.strip('/')), fmt)
 
+    def _save_notebook(self, os_path, nb):
+        """Save the notebook, unless the file already has the same content and if_unchanged is not 'write'"""
+        if self.if_unchanged == 'write':
+            return super(TextFileContentsManager, self)._save_notebook(os_path, nb)
+
+        # nbformat.writes returns the text representation when saving to a text format
+        text = nbformat.writes(nb, version=nbformat.NO_CONVERT)
+        if not text.endswith(u'\n'):
+            text += u'\n'
+        if elide_unchanged_write(os_path, text, self.if_unchanged):
+            self.log.info("%s is unchanged", os.path.basename(os_path))
+            return None
+
+        with self.atomic_writing(os_path, encoding='utf-8') as stream:
+            stream.write(text)
+        return None
+
     def save(self, model, path=''):
         """Save the file model and return the model with no content."""
         if model['type'] != 'notebook':
@@ -248,7 +352,8 @@ class TextFileContentsManager(FileContentsManager, Configurable):
                 latest_result = super(TextFileContentsManager, self).save(model, alt_path)
 
             # And then to the other formats, in reverse order so that
-            # the first format is the most recent
+            # the first format is the most recent. The cells are analysed only once for all the formats
+            writer = PairedFormatsWriter()
             for fmt in jupytext_formats[::-1]:
                 if fmt['extension'] == '.ipynb':
                     continue
@@ -261,8 +366,9 @@ class TextFileContentsManager(FileContentsManager, Configurable):
                                   os.path.basename(alt_path), fmt['extension'][1:], fmt['format_name'])
                 else:
                     self.log.info("Saving %s", os.path.basename(alt_path))
-                with mock.patch('nbformat.writes', _jupytext_writes(fmt)):
+                with mock.patch('nbformat.writes', _jupytext_writes(fmt, writer)):
                     latest_result = super(TextFileContentsManager, self).save(model, alt_path)
+                self.format_cache.invalidate(self._get_os_path(alt_path))
 
             return latest_result
 
@@ -283,7 +389,7 @@ class TextFileContentsManager(FileContentsManager, Configurable):
             model = self._notebook_model(path, content=content)
         else:
             self.set_default_format_options(fmt, read=True)
-            with mock.patch('nbformat.reads', _jupytext_reads(fmt)):
+            with mock.patch('nbformat.reads', self._cached_format_reads(self._get_os_path(path), fmt)):
                 model = self._notebook_model(path, content=content)
 
         if not load_alternative_format:
@@ -415,6 +521,8 @@ class TextFileContentsManager(FileContentsManager, Configurable):
         """Rename the current notebook, as well as its alternative representations"""
         if old_path not in self.paired_notebooks:
             super(TextFileContentsManager, self).rename_file(old_path, new_path)
+            self.format_cache.invalidate(self._get_os_path(old_path))
+            self.format_cache.invalidate(self._get_os_path(new_path))
             return
 
         fmt, formats = self.paired_notebooks.get(old_path)
@@ -430,6 +538,8 @@ class TextFileContentsManager(FileContentsManager, Configurable):
             new_alt_path = full_path(new_base, alt_fmt)
             if self.exists(old_alt_path):
                 super(TextFileContentsManager, self).rename_file(old_alt_path, new_alt_path)
+            self.format_cache.invalidate(self._get_os_path(old_alt_path))
+            self.format_cache.invalidate(self._get_os_path(new_alt_path))
 
         self.drop_paired_notebook(old_path)
         self.update_paired_notebooks(new_path, fmt, formats)
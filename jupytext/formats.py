@@ -5,8 +5,14 @@ new formats here!
 
 import os
 import re
-import nbformat
-from .header import header_to_metadata_and_cell, insert_or_test_version_number
+import json
+import hashlib
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+from .header import insert_or_test_version_number, parsed_document
 from .cell_reader import MarkdownCellReader, RMarkdownCellReader, \
     LightScriptCellReader, RScriptCellReader, DoublePercentScriptCellReader, HydrogenCellReader, \
     SphinxGalleryScriptCellReader
@@ -134,18 +140,54 @@ NOTEBOOK_EXTENSIONS = list(dict.fromkeys(['.ipynb'] + [fmt.extension for fmt in
 EXTENSION_PREFIXES = ['.lgt', '.spx', '.pct', '.hyd', '.nb']
 
 
+class FormatRegistry(object):
+    """An index of the format implementations by extension, and by extension and format name.
+    The index is rebuilt if formats are added to JUPYTEXT_FORMATS"""
+
+    def __init__(self, formats):
+        self.formats = formats
+        self.size = None
+        self.by_extension = {}
+        self.by_name = {}
+
+    def update(self):
+        """Index the formats again if the list of formats has changed"""
+        if self.size == len(self.formats):
+            return
+        self.by_extension = {}
+        self.by_name = {}
+        for fmt in self.formats:
+            self.by_extension.setdefault(fmt.extension, []).append(fmt)
+            self.by_name.setdefault((fmt.extension, fmt.format_name), fmt)
+            # The first format for an extension is the default one
+            self.by_name.setdefault((fmt.extension, None), fmt)
+        self.size = len(self.formats)
+
+    def formats_for_extension(self, ext):
+        """The formats for that extension, the default one first"""
+        self.update()
+        return self.by_extension.get(ext, [])
+
+    def get(self, ext, format_name=None):
+        """The format with that extension and name (or the default format for that extension), or None"""
+        if self.size != len(self.formats):
+            self.update()
+        return self.by_name.get((ext, format_name or None))
+
+
+FORMAT_REGISTRY = FormatRegistry(JUPYTEXT_FORMATS)
+
+
 def get_format_implementation(ext, format_name=None):
     """Return the implementation for the desired format"""
     # remove pre-extension if any
     ext = '.' + ext.split('.')[-1]
 
-    formats_for_extension = []
-    for fmt in JUPYTEXT_FORMATS:
-        if fmt.extension == ext:
-            if fmt.format_name == format_name or not format_name:
-                return fmt
-            formats_for_extension.append(fmt.format_name)
+    fmt = FORMAT_REGISTRY.get(ext, format_name)
+    if fmt is not None:
+        return fmt
 
+    formats_for_extension = [fmt.format_name for fmt in FORMAT_REGISTRY.formats_for_extension(ext)]
     if formats_for_extension:
         raise JupytextFormatError("Format '{}' is not associated to extension '{}'. "
                                   "Please choose one of: {}.".format(format_name, ext,
@@ -154,18 +196,18 @@ def get_format_implementation(ext, format_name=None):
 
 
 def read_metadata(text, ext):
-    """Return the header metadata"""
+    """Return the header metadata. The text can be either a string, or a ParsedDocument"""
     ext = '.' + ext.split('.')[-1]
-    lines = text.splitlines()
+    document = parsed_document(text, ext)
 
     if ext in ['.md', '.Rmd']:
         comment = ''
     else:
         comment = _SCRIPT_EXTENSIONS.get(ext, {}).get('comment', '#')
 
-    metadata, _, _, _ = header_to_metadata_and_cell(lines, comment, ext)
+    metadata, _, _, _ = document.header(comment, ext)
     if ext in ['.r', '.R'] and not metadata:
-        metadata, _, _, _ = header_to_metadata_and_cell(lines, "#'", ext)
+        metadata, _, _, _ = document.header("#'", ext)
 
     return metadata
 
@@ -177,11 +219,25 @@ def read_format_from_metadata(text, ext):
     return format_name_for_ext(metadata, ext, explicit_default=False)
 
 
+# Only the first lines of a document are scanned when guessing its format
+_GUESS_FORMAT_MAX_LINES = 10000
+
+# The formats guessed by scanning the lines, by extension and hash of the lines
+_GUESSED_FORMATS = OrderedDict()
+_GUESSED_FORMATS_SIZE = 1024
+
+
 def guess_format(text, ext):
     """Guess the format of the file, given its extension and content"""
-    lines = text.splitlines()
+    document = parsed_document(text, ext)
+    if ext not in document.guessed_formats:
+        document.guessed_formats[ext] = _guess_format(document, ext)
+    return document.guessed_formats[ext]
 
-    metadata = read_metadata(text, ext)
+
+def _guess_format(document, ext):
+    """Guess the format of the parsed document"""
+    metadata = read_metadata(document, ext)
 
     if ('jupytext' in metadata and set(metadata['jupytext'])
             .difference(['encoding', 'executable', 'main_language'])) or \
@@ -191,73 +247,103 @@ def guess_format(text, ext):
     # Is this a Hydrogen-like script?
     # Or a Sphinx-gallery script?
     if ext in _SCRIPT_EXTENSIONS:
-        comment = _SCRIPT_EXTENSIONS[ext]['comment']
-        twenty_hash = ''.join(['#'] * 20)
-        magic_re = re.compile(r'^(%|%%|%%%)[a-zA-Z]')
-        double_percent_re = re.compile(r'^{}( %%|%%)$'.format(comment))
-        double_percent_and_space_re = re.compile(r'^{}( %%|%%)\s'.format(comment))
-        nbconvert_script_re = re.compile(r'^{}( <codecell>| In\[[0-9 ]*\]:?)'.format(comment))
-        twenty_hash_count = 0
-        double_percent_count = 0
-        magic_command_count = 0
-        rspin_comment_count = 0
-
-        parser = StringParser(language='R' if ext in ['.r', '.R'] else 'python')
-        for line in lines:
-            parser.read_line(line)
-            if parser.is_quoted():
-                continue
-
-            # Don't count escaped Jupyter magics (no space between %% and command) as cells
-            if double_percent_re.match(line) or double_percent_and_space_re.match(line) or \
-                    nbconvert_script_re.match(line):
-                double_percent_count += 1
-
-            if magic_re.match(line):
-                magic_command_count += 1
-
-            if line.startswith(twenty_hash) and ext == '.py':
-                twenty_hash_count += 1
-
-            if line.startswith("#'") and ext in ['.R', '.r']:
-                rspin_comment_count += 1
-
-        if double_percent_count >= 1:
-            if magic_command_count:
-                return 'hydrogen'
-            return 'percent'
-
-        if twenty_hash_count >= 2:
-            return 'sphinx'
-
-        if rspin_comment_count >= 1:
-            return 'spin'
+        lines = document.lines[:_GUESS_FORMAT_MAX_LINES]
+        text = '\n'.join(lines)
+        key = (ext, hashlib.sha1(text.encode('utf-8')).hexdigest())
+        if key in _GUESSED_FORMATS:
+            format_name = _GUESSED_FORMATS.pop(key)
+        else:
+            format_name = _guess_format_from_lines(lines, text, ext)
+            while len(_GUESSED_FORMATS) >= _GUESSED_FORMATS_SIZE:
+                _GUESSED_FORMATS.popitem(last=False)
+        _GUESSED_FORMATS[key] = format_name
+        if format_name:
+            return format_name
 
     # Default format
     return get_format_implementation(ext).format_name
 
 
+def _guess_format_from_lines(lines, text, ext):
+    """Guess the format of a script from its cell markers, magic commands and comments,
+    or return None for the default format. The text is the concatenation of the lines"""
+    comment = _SCRIPT_EXTENSIONS[ext]['comment']
+    twenty_hash = ''.join(['#'] * 20)
+
+    # None of the lines can be a cell marker or a comment specific to a format
+    if '%%' not in text and 'In[' not in text and '<codecell>' not in text and \
+            (ext != '.py' or twenty_hash not in text) and (ext not in ['.R', '.r'] or "#'" not in text):
+        return None
+
+    magic_re = re.compile(r'^(%|%%|%%%)[a-zA-Z]')
+    double_percent_re = re.compile(r'^{}( %%|%%)$'.format(comment))
+    double_percent_and_space_re = re.compile(r'^{}( %%|%%)\s'.format(comment))
+    nbconvert_script_re = re.compile(r'^{}( <codecell>| In\[[0-9 ]*\]:?)'.format(comment))
+    twenty_hash_count = 0
+    double_percent_count = 0
+    magic_command_count = 0
+    rspin_comment_count = 0
+
+    parser = StringParser(language='R' if ext in ['.r', '.R'] else 'python')
+    for line in lines:
+        parser.read_line(line)
+        if parser.is_quoted():
+            continue
+
+        # Don't count escaped Jupyter magics (no space between %% and command) as cells
+        if double_percent_re.match(line) or double_percent_and_space_re.match(line) or \
+                nbconvert_script_re.match(line):
+            double_percent_count += 1
+
+        if magic_re.match(line):
+            magic_command_count += 1
+
+        # Cell markers and magic commands: the other lines cannot change the format
+        if double_percent_count and magic_command_count:
+            return 'hydrogen'
+
+        if line.startswith(twenty_hash) and ext == '.py':
+            twenty_hash_count += 1
+
+        if line.startswith("#'") and ext in ['.R', '.r']:
+            rspin_comment_count += 1
+
+    if double_percent_count >= 1:
+        return 'percent'
+
+    if twenty_hash_count >= 2:
+        return 'sphinx'
+
+    if rspin_comment_count >= 1:
+        return 'spin'
+
+    return None
+
+
 def divine_format(text):
     """Guess the format of the notebook, based on its content #148"""
-    try:
-        nbformat.reads(text, as_version=4)
-        return 'ipynb'
-    except nbformat.reader.NotJSONError:
-        pass
-
-    lines = text.splitlines()
-    for comment in ['', '#'] + _COMMENT_CHARS:
-        metadata, _, _, _ = header_to_metadata_and_cell(lines, comment)
-        ext = metadata.get('jupytext', {}).get('text_representation', {}).get('extension')
-        if ext:
-            return ext[1:] + ':' + guess_format(text, ext)
+    # Notebooks in the ipynb format are JSON objects
+    if text.lstrip().startswith('{'):
+        try:
+            json.loads(text)
+            return 'ipynb'
+        except ValueError:
+            pass
+
+    document = parsed_document(text)
+    # The YAML header starts on one of the first three lines (after the shebang and encoding lines)
+    if any('---' in line for line in document.lines[:3]):
+        for comment in ['', '#'] + _COMMENT_CHARS:
+            metadata, _, _, _ = document.header(comment)
+            ext = metadata.get('jupytext', {}).get('text_representation', {}).get('extension')
+            if ext:
+                return ext[1:] + ':' + guess_format(document, ext)
 
     # No metadata, but ``` on at least one line => markdown
-    for line in lines:
-        if line == '```':
-            return 'md'
+    if '```' in document.lines:
+        return 'md'
 
-    return 'py:' + guess_format(text, '.py')
+    return 'py:' + guess_format(document, '.py')
 
 
 def check_file_version(notebook, source_path, outputs_path):
@@ -383,14 +469,57 @@ def rearrange_jupytext_metadata(metadata):
         metadata['jupytext'] = jupytext_metadata
 
 
-def long_form_one_format(jupytext_format, metadata=None):
-    """Parse 'sfx.py:percent' into {'suffix':'sfx', 'extension':'py', 'format_name':'percent'}"""
-    if isinstance(jupytext_format, dict):
-        return jupytext_format
+class ParsedFormat(Mapping):
+    """A format parsed from its short form, like {'extension': '.py', 'format_name': 'percent'}
+    for 'py:percent'. Parsed formats are immutable and hashable"""
+    __slots__ = ('_fmt', '_hash')
 
-    if not jupytext_format:
-        return {}
+    def __init__(self, fmt):
+        self._fmt = dict(fmt)
+        self._hash = hash(frozenset(self._fmt.items()))
 
+    def __getitem__(self, key):
+        return self._fmt[key]
+
+    def __iter__(self):
+        return iter(self._fmt)
+
+    def __len__(self):
+        return len(self._fmt)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return 'ParsedFormat({!r})'.format(self._fmt)
+
+    def to_dict(self):
+        """A (mutable) copy of the format, as a dictionary"""
+        return dict(self._fmt)
+
+
+# The parsed formats are memoized by their short form
+_PARSED_FORMATS = {}
+_PARSED_MULTIPLE_FORMATS = {}
+_MAX_PARSED_FORMATS = 1024
+
+
+def _memoize_parsed_format(cache, key, value):
+    if len(cache) >= _MAX_PARSED_FORMATS:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def parse_one_format(jupytext_format):
+    """Parse 'sfx.py:percent' into ParsedFormat({'suffix':'sfx', 'extension':'py', 'format_name':'percent'}).
+    The 'auto' extension is not resolved"""
+    parsed = _PARSED_FORMATS.get(jupytext_format)
+    if parsed is not None:
+        return parsed
+
+    fmt = {}
+    short_form = jupytext_format
     common_name_to_ext = {'notebook': 'ipynb',
                           'rmarkdown': 'Rmd',
                           'markdown': 'md',
@@ -398,8 +527,6 @@ def long_form_one_format(jupytext_format, metadata=None):
     if jupytext_format.lower() in common_name_to_ext:
         jupytext_format = common_name_to_ext[jupytext_format.lower()]
 
-    fmt = {}
-
     if jupytext_format.rfind('/') > 0:
         fmt['prefix'], jupytext_format = jupytext_format.rsplit('/', 1)
 
@@ -414,23 +541,58 @@ def long_form_one_format(jupytext_format, metadata=None):
     if not ext.startswith('.'):
         ext = '.' + ext
 
-    if ext == '.auto':
-        ext = auto_ext_from_metadata(metadata) if metadata is not None else '.auto'
-        if not ext:
+    fmt['extension'] = ext
+    return _memoize_parsed_format(_PARSED_FORMATS, short_form, ParsedFormat(fmt))
+
+
+def parse_multiple_formats(jupytext_formats):
+    """Parse and validate a comma separated list of formats, and return a tuple of ParsedFormat"""
+    parsed = _PARSED_MULTIPLE_FORMATS.get(jupytext_formats)
+    if parsed is not None:
+        return parsed
+
+    parsed = tuple(parse_one_format(fmt) for fmt in jupytext_formats.split(',') if fmt)
+    for fmt in parsed:
+        validate_one_format(fmt)
+    return _memoize_parsed_format(_PARSED_MULTIPLE_FORMATS, jupytext_formats, parsed)
+
+
+def resolve_auto_extension(fmt, metadata):
+    """Replace the 'auto' extension in the format with the script extension of the notebook"""
+    if fmt['extension'] == '.auto' and metadata is not None:
+        fmt['extension'] = auto_ext_from_metadata(metadata)
+        if not fmt['extension']:
             raise JupytextFormatError("No language information in this notebook. Please replace 'auto' with "
                                       "an actual script extension.")
-
-    fmt['extension'] = ext
     return fmt
 
 
+def long_form_one_format(jupytext_format, metadata=None):
+    """Parse 'sfx.py:percent' into {'suffix':'sfx', 'extension':'py', 'format_name':'percent'}"""
+    if isinstance(jupytext_format, dict):
+        return jupytext_format
+
+    if not jupytext_format:
+        return {}
+
+    if not isinstance(jupytext_format, ParsedFormat):
+        jupytext_format = parse_one_format(jupytext_format)
+
+    return resolve_auto_extension(jupytext_format.to_dict(), metadata)
+
+
 def long_form_multiple_formats(jupytext_formats, metadata=None):
     """Convert a concise encoding of jupytext.formats to a list of formats, encoded as dictionaries"""
     if not jupytext_formats:
         return []
 
     if not isinstance(jupytext_formats, list):
-        jupytext_formats = [fmt for fmt in jupytext_formats.split(',') if fmt]
+        jupytext_formats = [fmt.to_dict() for fmt in parse_multiple_formats(jupytext_formats)]
+        if metadata is not None:
+            for fmt in jupytext_formats:
+                if fmt['extension'] == '.auto':
+                    validate_one_format(resolve_auto_extension(fmt, metadata))
+        return jupytext_formats
 
     jupytext_formats = [long_form_one_format(fmt, metadata) for fmt in jupytext_formats]
 
@@ -442,7 +604,7 @@ def long_form_multiple_formats(jupytext_formats, metadata=None):
 
 def short_form_one_format(jupytext_format):
     """Represent one jupytext format as a string"""
-    if not isinstance(jupytext_format, dict):
+    if not isinstance(jupytext_format, (dict, ParsedFormat)):
         return jupytext_format
     fmt = jupytext_format['extension']
     if 'suffix' in jupytext_format:
@@ -475,7 +637,7 @@ _VALID_FORMAT_OPTIONS = _BINARY_FORMAT_OPTIONS + ['notebook_metadata_filter', 'c
 
 def validate_one_format(jupytext_format):
     """Validate extension and options for the given format"""
-    if not isinstance(jupytext_format, dict):
+    if not isinstance(jupytext_format, (dict, ParsedFormat)):
         raise JupytextFormatError('Jupytext format should be a dictionary')
 
     for key in jupytext_format:
@@ -2,14 +2,15 @@
 """
 
 import re
-import yaml
+from copy import deepcopy
 from yaml.representer import SafeRepresenter
 import nbformat
 from nbformat.v4.nbbase import new_raw_cell
 from .version import __version__
 from .languages import _SCRIPT_EXTENSIONS, comment_lines
-from .metadata_filter import filter_metadata
+from .metadata_filter import compile_metadata_filter
 from .pep8 import pep8_lines_between_cells
+from . import yaml_header
 
 SafeRepresenter.add_representer(nbformat.NotebookNode, SafeRepresenter.represent_dict)
 
@@ -101,10 +102,10 @@ def metadata_and_cell_to_header(notebook, metadata, text_format, ext):
         del metadata['jupytext']
 
     notebook_metadata_filter = metadata.get('jupytext', {}).get('notebook_metadata_filter')
-    metadata = filter_metadata(metadata, notebook_metadata_filter, _DEFAULT_NOTEBOOK_METADATA)
+    metadata = compile_metadata_filter(notebook_metadata_filter, _DEFAULT_NOTEBOOK_METADATA).filter(metadata)
 
     if metadata:
-        header.extend(yaml.safe_dump({'jupyter': metadata}, default_flow_style=False).splitlines())
+        header.extend(yaml_header.dump({'jupyter': metadata}).splitlines())
 
     if header:
         header = ['---'] + header + ['---']
@@ -117,6 +118,15 @@ def header_to_metadata_and_cell(lines, header_prefix, ext=None):
     Return the metadata, a boolean to indicate if a jupyter section was found,
      the first cell of notebook if some metadata is found outside of the jupyter section, and next loc in text
     """
+    metadata, jupyter, cell, pos, _ = parse_header(lines, header_prefix, ext)
+    return metadata, jupyter, cell, pos
+
+
+def parse_header(lines, header_prefix, ext=None):
+    """
+    Same as header_to_metadata_and_cell, plus a boolean that is False when the header
+    may continue after the given lines (i.e. when the lines are only the beginning of the document)
+    """
 
     header = []
     jupyter = []
@@ -168,10 +178,13 @@ def header_to_metadata_and_cell(lines, header_prefix, ext=None):
             jupyter.append(line)
         else:
             header.append(line)
+    else:
+        # The header is still open at the end of the lines
+        return metadata, False, None, start, False
 
     if ended:
         if jupyter:
-            metadata.update(yaml.load('\n'.join(jupyter))['jupyter'])
+            metadata.update(yaml_header.load('\n'.join(jupyter))['jupyter'])
 
         lines_to_next_cell = 1
         if len(lines) > i + 1:
@@ -190,6 +203,36 @@ def header_to_metadata_and_cell(lines, header_prefix, ext=None):
         else:
             cell = None
 
-        return metadata, jupyter, cell, i + 1
+        return metadata, jupyter, cell, i + 1, True
+
+    return metadata, False, None, start, True
+
+
+class ParsedDocument(object):
+    """The lines of a text notebook, together with its header. The text is split
+    only once (or not at all, if the lines are given), and the header is parsed
+    at most once per header prefix"""
+
+    def __init__(self, text, ext=None, lines=None):
+        self.ext = ext
+        self.lines = text.splitlines() if lines is None else lines
+        self.headers = {}
+        self.guessed_formats = {}
+
+    def header(self, header_prefix, ext=None):
+        """Return the header metadata, the jupyter section of the header, the header cell, and
+        the position of the first cell. Metadata and cell are copies that the caller can modify"""
+        ext = ext or self.ext
+        key = (header_prefix, ext)
+        if key not in self.headers:
+            self.headers[key] = header_to_metadata_and_cell(self.lines, header_prefix, ext)
+
+        metadata, jupyter, cell, pos = self.headers[key]
+        return deepcopy(metadata), jupyter, deepcopy(cell), pos
+
 
-    return metadata, False, None, start
+def parsed_document(text, ext=None):
+    """Return the text as a parsed document (no-op if this is already a parsed document)"""
+    if isinstance(text, ParsedDocument):
+        return text
+    return ParsedDocument(text, ext)
@@ -2,22 +2,396 @@
 
 import os
 import io
+import re
 import sys
+import json
+import mmap
+import hashlib
 import logging
+import multiprocessing
 from copy import copy, deepcopy
+from itertools import chain, islice
 from nbformat.v4.rwbase import NotebookReader, NotebookWriter
 from nbformat.v4.nbbase import new_notebook, new_code_cell
 import nbformat
 from .formats import _VALID_FORMAT_OPTIONS
 from .formats import read_format_from_metadata, update_jupytext_formats_metadata, rearrange_jupytext_metadata
 from .formats import format_name_for_ext, guess_format, divine_format, get_format_implementation, long_form_one_format
-from .header import header_to_metadata_and_cell, metadata_and_cell_to_header
+from .formats import read_metadata as read_header_metadata
+from .formats import _GUESS_FORMAT_MAX_LINES, _guess_format_from_lines
+from .header import ParsedDocument, parsed_document, parse_header, metadata_and_cell_to_header
 from .header import encoding_and_executable, insert_or_test_version_number
 from .metadata_filter import update_metadata_filters
-from .languages import default_language_from_metadata_and_ext, set_main_and_cell_language
+from .languages import _SCRIPT_EXTENSIONS, default_language_from_metadata_and_ext, set_main_and_cell_language
+from .languages import main_language_from_metadata_and_ext, most_frequent_language
+from .cell_reader import LineTypes, TextCell, rst2md_batch
+from .cell_to_text import CellAnalysis, CELL_TEXT_CACHE
 from .pep8 import pep8_lines_between_cells
 
 
+class FollowingLines(object):
+    """The lines of the cells that follow a given cell, as a lazy sequence
+    that does not copy the text of the cells"""
+
+    def __init__(self, cell_texts, start):
+        self.cell_texts = cell_texts
+        self.start = start
+
+    def __iter__(self):
+        for i in range(self.start, len(self.cell_texts)):
+            for line in self.cell_texts[i]:
+                yield line
+
+    def __getitem__(self, index):
+        for line in islice(self, index, None):
+            return line
+        raise IndexError('FollowingLines index out of range')
+
+    def __bool__(self):
+        for _ in self:
+            return True
+        return False
+
+    __nonzero__ = __bool__
+
+
+try:
+    unicode  # Python 2
+except NameError:
+    unicode = str  # Python 3
+
+# Text files are decoded by blocks of about this size (in bytes)
+_READ_BLOCK_SIZE = 1 << 20
+
+# What to do with a file that already has the content to be written: write it again, only update
+# its modification time, or leave it untouched
+UNCHANGED_FILE_POLICIES = ['write', 'touch', 'skip']
+
+# Text notebooks shorter than this are always read in the current process
+_PARALLEL_READ_MIN_LINES = 100000
+_PY_TOP_LEVEL_CODE = re.compile(r"^[^\s#@]")
+
+
+def read_cells(fmt, default_language, lines, end):
+    """Read the cells in the first end lines of the given lines (the lines after end
+    are used to find where the last cell ends). Return the cells and their positions,
+    or None if the last cell does not end at end. This function runs in the worker processes"""
+    implementation = get_format_implementation(fmt['extension'], fmt.get('format_name'))
+    line_types = LineTypes(lines)
+    cells = []
+    positions = []
+    pos = 0
+    while pos < end:
+        reader = implementation.cell_reader_class(fmt, default_language)
+        cell, next_pos = reader.read_text_cell(lines, pos, line_types)
+        if next_pos <= pos:
+            return None  # pragma: no cover
+        cells.append(cell)
+        positions.append((pos, next_pos))
+        pos = next_pos
+
+    if pos != end:
+        return None
+    return cells, positions
+
+
+def _read_cells(args):
+    return read_cells(*args)
+
+
+class LineBuffer(object):
+    """The lines of a text stream, read by chunks. The lines before the current
+    cell are discarded when a new chunk is read, so that only a window of
+    the document is kept in memory"""
+
+    # Number of lines that the cell readers may look at after the end of a cell
+    lookahead = 3
+
+    def __init__(self, stream, chunk_size=1000, lines=None, ext=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.ext = ext
+        # A document that was already read is passed as a list of lines
+        self.lines = [] if lines is None else lines
+        self.line_types = LineTypes(self.lines)
+        self.exhausted = lines is not None
+
+    def read_more(self, start=0):
+        """Discard the lines before start, and read more lines from the stream.
+        Return the new position of the line that was at start"""
+        del self.lines[:start]
+        size = max(self.chunk_size, len(self.lines))
+        count = 0
+        for line in islice(self.stream, size):
+            count += 1
+            self.lines.extend(line.splitlines())
+        if count < size:
+            self.exhausted = True
+        self.line_types = LineTypes(self.lines)
+        return 0
+
+    def settled(self, pos):
+        """Do we have enough lines after pos to be sure that the cell readers would stop
+        at pos on the full document? The readers look at a few lines after the end of the
+        cell, and at the next line of code to see if a Python paragraph continues. In Python
+        scripts, they also look past the decorators and indented lines for a function or a class"""
+        if self.exhausted:
+            return True
+        if pos + self.lookahead >= len(self.lines):
+            return False
+        if self.ext == '.py':
+            return self.line_types.next_match(_PY_TOP_LEVEL_CODE, pos) < len(self.lines)
+        return self.line_types.next_code(pos) < len(self.lines)
+
+    def header(self, header_prefix, ext=None):
+        """Read lines until the header is complete, and return it"""
+        while True:
+            metadata, jupyter, cell, pos, complete = parse_header(self.lines, header_prefix, ext)
+            if self.exhausted or (complete and self.settled(pos)):
+                return metadata, jupyter, cell, pos
+            self.read_more()
+
+
+class LazyCells(object):
+    """The cells of a notebook, read only as far as the highest index accessed"""
+
+    def __init__(self, cells, on_complete=None):
+        self._cells = []
+        self._iterator = iter(cells)
+        self._on_complete = on_complete
+
+    def _read_until(self, index=None):
+        """Read the cells up to the given index (all cells if index is None)"""
+        while self._iterator is not None and (index is None or len(self._cells) <= index):
+            try:
+                self._cells.append(next(self._iterator))
+            except StopIteration:
+                self._iterator = None
+                if self._on_complete is not None:
+                    self._on_complete()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.stop is None or index.stop < 0 or (index.start or 0) < 0 or (index.step or 1) < 0:
+                self._read_until()
+            else:
+                self._read_until(index.stop - 1)
+        elif index < 0:
+            self._read_until()
+        else:
+            self._read_until(index)
+        return self._cells[index]
+
+    def __iter__(self):
+        i = 0
+        while True:
+            self._read_until(i)
+            if i >= len(self._cells):
+                return
+            yield self._cells[i]
+            i += 1
+
+    def __len__(self):
+        self._read_until()
+        return len(self._cells)
+
+    def __bool__(self):
+        self._read_until(0)
+        return bool(self._cells)
+
+    __nonzero__ = __bool__
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class LazyNotebook(object):
+    """A notebook whose metadata is read from the header, and whose cells are read on
+    first access. The cell metadata filter, which depends on the metadata of all cells,
+    is completed when all the cells have been read"""
+    nbformat_minor = nbformat.v4.nbformat_minor
+    nbformat = nbformat.v4.nbformat
+
+    def __init__(self, metadata, cells, complete_metadata=None):
+        self.metadata = metadata
+        self._complete_metadata = complete_metadata
+        self.cells = LazyCells(cells, on_complete=self._update_metadata)
+
+    def _update_metadata(self):
+        if self._complete_metadata is not None:
+            metadata = self._complete_metadata()
+            self.metadata.clear()
+            self.metadata.update(metadata)
+
+    def __getitem__(self, key):
+        if key not in ['cells', 'metadata', 'nbformat', 'nbformat_minor']:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_notebook(self):
+        """Read all the cells and return the notebook"""
+        return new_notebook(cells=list(self.cells), metadata=self.metadata)
+
+
+class TextNotebook(object):
+    """A notebook read from a text file, whose cells are TextCell records rather than NotebookNode.
+    The notebook can be written to text formats as is, and is converted to a NotebookNode
+    (and validated) with to_notebook"""
+    nbformat_minor = nbformat.v4.nbformat_minor
+    nbformat = nbformat.v4.nbformat
+
+    def __init__(self, metadata, cells):
+        self.metadata = metadata
+        self.cells = cells
+
+    def __getitem__(self, key):
+        if key not in ['cells', 'metadata', 'nbformat', 'nbformat_minor']:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_notebook(self):
+        """Return the notebook as a NotebookNode. The cells are validated once, with the notebook"""
+        return new_notebook(cells=[cell.to_notebook_node(validate=False) if isinstance(cell, TextCell) else cell
+                                   for cell in self.cells], metadata=self.metadata)
+
+
+class UnknownLines(Exception):
+    """The lines that follow a cell depend on cells that are not rendered yet"""
+
+
+class CellTextWindow(object):
+    """The text of consecutive cells, rendered one at a time. The end of each cell (end of cell
+    marker, blank lines) depends on the text of the cells that follow: a cell is final when
+    the cells in the window are enough to determine its text. The other cells only have
+    the lines that do not depend on the following cells, and are completed again when
+    the window is extended"""
+
+    def __init__(self, converter, cells, default_language, analysis=None):
+        self.converter = converter
+        self.cells = cells
+        self.default_language = default_language
+        self.analysis = analysis or CellAnalysis()
+        self.first = 0
+        self.exporters = []
+        self.lines_to_next_cell = []
+        self.texts = []
+        self.completed = []
+        self.cell_texts = []
+        self.final = []
+        self.dropped = []
+        self.looking_for_first_markdown_cell = converter.implementation.format_name and \
+            converter.implementation.format_name.startswith('sphinx')
+
+    def is_complete(self):
+        """Does the window extend to the last cell?"""
+        return self.first + len(self.texts) == len(self.cells)
+
+    def extend(self):
+        """Add the next cell to the window, and complete the cells that are not final"""
+        if self.is_complete():
+            raise ValueError('The window already contains the last cell')  # pragma: no cover
+        cell = self.cells[self.first + len(self.texts)]
+        exporter = self.converter.implementation.cell_exporter_class(cell, self.default_language, self.converter.fmt,
+                                                                     self.analysis)
+        if self.looking_for_first_markdown_cell and cell.cell_type == 'markdown':
+            exporter.metadata.setdefault('cell_marker', '"""')
+            self.looking_for_first_markdown_cell = False
+
+        self.exporters.append(exporter)
+        self.lines_to_next_cell.append(exporter.lines_to_next_cell)
+        text = CELL_TEXT_CACHE.cell_to_text(exporter)
+        self.texts.append(text)
+        self.completed.append(text[:-1])
+        self.cell_texts.append(text[:-1])
+        self.final.append(False)
+        self.dropped.append(False)
+
+        # Complete the cells in reverse order, as each cell depends on the cells that follow
+        for i in reversed(range(len(self.texts))):
+            if not self.final[i]:
+                self.complete_cell(i)
+            if i + 1 < len(self.texts):
+                self.cell_texts[i + 1] = self.completed[i + 1] if self.dropped[i] else \
+                    self.exporters[i + 1].simplify_soc_marker(copy(self.completed[i + 1]), self.completed[i])
+
+    def complete_cell(self, i):
+        """Complete the text of the cell at the given position in the window, if the following
+        cells are known well enough"""
+        converter = self.converter
+        cell = self.exporters[i]
+        has_next_cell = self.first + i + 1 < len(self.cells)
+        lines = WindowLines(self, i + 1)
+        cell.lines_to_next_cell = self.lines_to_next_cell[i]
+        try:
+            text = cell.remove_eoc_marker(copy(self.texts[i]), lines)
+
+            if self.first + i == 0 and converter.implementation.format_name and \
+                    converter.implementation.format_name.startswith('sphinx') and \
+                    (text in [['%matplotlib inline'], ['# %matplotlib inline']]):
+                self.completed[i] = []
+                self.final[i] = self.dropped[i] = True
+                return
+
+            lines_to_next_cell = cell.lines_to_next_cell
+            if lines_to_next_cell is None:
+                lines_to_next_cell = pep8_lines_between_cells(text, lines, converter.implementation.extension)
+
+            if has_next_cell and i + 1 == len(self.texts):
+                raise UnknownLines()
+        except UnknownLines:
+            return
+
+        text.extend([''] * lines_to_next_cell)
+
+        # two blank lines between markdown cells in Rmd
+        if converter.ext in ['.Rmd', '.md'] and not cell.is_code():
+            if has_next_cell and not self.exporters[i + 1].is_code() and (
+                    not converter.fmt.get('split_at_heading', False) or
+                    not (self.texts[i + 1] and self.texts[i + 1][0].startswith('#'))):
+                text.append('')
+
+        # "" between two consecutive code cells in sphinx
+        if converter.implementation.format_name.startswith('sphinx') and cell.is_code():
+            if has_next_cell and self.exporters[i + 1].is_code():
+                text.append('""')
+
+        self.completed[i] = text
+        self.final[i] = True
+
+    def pop(self):
+        """Remove the first cell from the window, and return its exporter, its text,
+        and whether the cell was dropped"""
+        self.first += 1
+        self.texts.pop(0)
+        self.cell_texts.pop(0)
+        self.final.pop(0)
+        self.lines_to_next_cell.pop(0)
+        return self.exporters.pop(0), self.completed.pop(0), self.dropped.pop(0)
+
+
+class WindowLines(FollowingLines):
+    """The lines that follow a given cell in a CellTextWindow. The first of these cells
+    is seen before the simplification of its start of cell marker. Iterating over lines
+    that depend on cells that are not rendered yet raises UnknownLines"""
+
+    def __init__(self, window, start):
+        FollowingLines.__init__(self, window.cell_texts, start)
+        self.window = window
+
+    def __iter__(self):
+        window = self.window
+        for i in range(self.start, len(window.texts)):
+            for line in window.completed[i] if i == self.start else window.cell_texts[i]:
+                yield line
+            if not window.final[i]:
+                raise UnknownLines()
+        if not window.is_complete():
+            raise UnknownLines()
+
+
 class TextNotebookConverter(NotebookReader, NotebookWriter):
     """A class that can read or write a Jupyter notebook as text"""
 
@@ -36,58 +410,246 @@ class TextNotebookConverter(NotebookReader, NotebookWriter):
             if opt in self.fmt:
                 metadata.setdefault('jupytext', {}).setdefault(opt, self.fmt[opt])
 
-    def reads(self, s, **_):
-        """Read a notebook represented as text"""
-        lines = s.splitlines()
+    def reads(self, s, processes=None, **_):
+        """Read a notebook represented as text (a string, or a ParsedDocument). Long documents
+        in formats with explicit cell markers can be read with the given number of processes"""
+        notebook, _ = self.reads_with_positions(s, processes)
+        return notebook
+
+    def reads_with_positions(self, s, processes=None):
+        """Same as reads, but also return the position of the cells in the text: the first
+        line of the cell and the first line of the next cell, or None for the cells that
+        are not read by the cell readers (header, and %matplotlib cell in Sphinx scripts)"""
+        notebook, positions = self.reads_text_notebook(s, processes)
+        return notebook.to_notebook(), positions
+
+    def reads_text_notebook(self, s, processes=None):
+        """Same as reads_with_positions, but return the notebook as a TextNotebook"""
+        document = parsed_document(s, self.implementation.extension)
+        lines = document.lines
 
         cells = []
-        metadata, jupyter_md, header_cell, pos = header_to_metadata_and_cell(lines,
-                                                                             self.implementation.header_prefix,
-                                                                             self.implementation.extension)
+        positions = []
+        metadata, jupyter_md, header_cell, pos = document.header(self.implementation.header_prefix,
+                                                                 self.implementation.extension)
         default_language = default_language_from_metadata_and_ext(metadata, self.implementation.extension)
         self.update_fmt_with_notebook_options(metadata)
 
         if header_cell:
             cells.append(header_cell)
-
-        lines = lines[pos:]
+            positions.append(None)
 
         if self.implementation.format_name and self.implementation.format_name.startswith('sphinx'):
-            cells.append(new_code_cell(source='%matplotlib inline'))
+            cells.append(TextCell('code', '%matplotlib inline', {}))
+            positions.append(None)
 
         cell_metadata = set()
 
-        while lines:
-            reader = self.implementation.cell_reader_class(self.fmt, default_language)
-            cell, pos = reader.read(lines)
+        # The markdown cells of Sphinx Gallery scripts are converted to Markdown in one batch
+        reader_fmt = self.fmt
+        is_sphinx = self.implementation.format_name and self.implementation.format_name.startswith('sphinx')
+        if is_sphinx and self.fmt.get('rst2md'):
+            reader_fmt = copy(self.fmt)
+            reader_fmt['rst2md'] = False
+
+        # The cell readers share the list of lines and their classification,
+        # and return the absolute position of the next cell
+        line_types = LineTypes(lines)
+        parallel_cells = None
+        if processes and len(lines) - pos >= _PARALLEL_READ_MIN_LINES:
+            parallel_cells = self.read_cells_in_parallel(lines, pos, line_types, default_language, processes)
+
+        if parallel_cells is not None:
+            parallel_cells, parallel_positions = parallel_cells
+            cells.extend(parallel_cells)
+            positions.extend(parallel_positions)
+            for cell in parallel_cells:
+                cell_metadata.update(cell.metadata.keys())
+            pos = len(lines)
+
+        while pos < len(lines):
+            reader = self.implementation.cell_reader_class(reader_fmt, default_language)
+            cell, next_pos = reader.read_text_cell(lines, pos, line_types)
             cells.append(cell)
+            positions.append((pos, next_pos))
             cell_metadata.update(cell.metadata.keys())
-            if pos <= 0:
-                raise Exception('Blocked at lines ' + '\n'.join(lines[:6]))  # pragma: no cover
-            lines = lines[pos:]
+            if next_pos <= pos:
+                raise Exception('Blocked at lines ' + '\n'.join(lines[pos:pos + 6]))  # pragma: no cover
+            pos = next_pos
+
+        if reader_fmt is not self.fmt:
+            markdown_cells = [cell for cell, position in zip(cells, positions)
+                              if position is not None and cell.cell_type == 'markdown' and cell.source]
+            for cell, source in zip(markdown_cells, rst2md_batch([cell.source for cell in markdown_cells])):
+                cell.source = '\n'.join(source.splitlines())
 
         update_metadata_filters(metadata, jupyter_md, cell_metadata)
         set_main_and_cell_language(metadata, cells, self.implementation.extension)
 
-        if self.implementation.format_name and self.implementation.format_name.startswith('sphinx'):
+        if is_sphinx:
             filtered_cells = []
+            filtered_positions = []
             for i, cell in enumerate(cells):
                 if cell.source == '' and i > 0 and i + 1 < len(cells) \
                         and cells[i - 1].cell_type != 'markdown' and cells[i + 1].cell_type != 'markdown':
                     continue
                 filtered_cells.append(cell)
+                filtered_positions.append(positions[i])
             cells = filtered_cells
+            positions = filtered_positions
 
         # The rst2md option applies just once
         if self.fmt.get('rst2md'):
             metadata['jupytext']['rst2md'] = False
 
-        return new_notebook(cells=cells, metadata=metadata)
+        return TextNotebook(metadata, cells), positions
+
+    def read_cells_in_parallel(self, lines, pos, line_types, default_language, processes):
+        """Split the lines at cell markers, and read the chunks in a process pool. Return the cells
+        and their positions, or None if the format has no unambiguous cell marker"""
+        reader = self.implementation.cell_reader_class(self.fmt, default_language)
+        cell_starts = reader.find_cell_starts(lines, pos, line_types)
+        if not cell_starts:
+            return None
+
+        # Four chunks per process, of about the same size
+        chunk_size = max((len(lines) - pos) // (4 * processes), 1)
+        chunk_starts = [pos]
+        for cell_start in cell_starts:
+            if cell_start - chunk_starts[-1] >= chunk_size:
+                chunk_starts.append(cell_start)
+
+        chunks = []
+        for start, end in zip(chunk_starts, chunk_starts[1:] + [len(lines)]):
+            chunks.append((self.fmt, default_language, lines[start:self.chunk_end(lines, end, line_types)], end - start))
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_read_cells, chunks)
+        finally:
+            pool.close()
+            pool.join()
+
+        if any(result is None for result in results):
+            return None  # pragma: no cover
+
+        cells = []
+        positions = []
+        for start, (chunk_cells, chunk_positions) in zip(chunk_starts, results):
+            cells.extend(chunk_cells)
+            positions.extend((start + cell_start, start + next_cell) for cell_start, next_cell in chunk_positions)
+        return cells, positions
+
+    def chunk_end(self, lines, end, line_types):
+        """The end of the lines needed to read the cells before end. The cell readers look at the blank
+        lines after the cell, at the next line of code (is it indented?), and, in Python scripts,
+        at the next lines up to the first non-indented code"""
+        chunk_end = max(min(end + 3, len(lines)), min(line_types.next_code(end) + 1, len(lines)))
+        if self.implementation.extension == '.py':
+            while chunk_end < len(lines) and not _PY_TOP_LEVEL_CODE.match(lines[chunk_end - 1]):
+                chunk_end += 1
+        return chunk_end
+
+    def lazy_reads(self, s):
+        """Read the header of a notebook represented as text. Return the metadata, an iterator
+        over the cells, and a function that returns the metadata once all the cells have been read"""
+        document = parsed_document(s, self.implementation.extension)
+        metadata, jupyter_md, _, _ = document.header(self.implementation.header_prefix,
+                                                     self.implementation.extension)
+        self.update_fmt_with_notebook_options(metadata)
+
+        # Without a kernel, the main language is the most frequent one among the cells
+        if not main_language_from_metadata_and_ext(metadata, self.implementation.extension):
+            notebook = self.reads(document)
+            return notebook.metadata, notebook.cells, None
+
+        set_main_and_cell_language(metadata, [], self.implementation.extension)
+
+        # The rst2md option applies just once
+        if self.fmt.get('rst2md'):
+            metadata['jupytext']['rst2md'] = False
+
+        cell_metadata = set()
+        cells = self.iter_cells(LineBuffer(None, lines=document.lines), cell_metadata)
+
+        def complete_metadata():
+            """The notebook metadata, with the cell metadata filter"""
+            complete = deepcopy(metadata)
+            update_metadata_filters(complete, jupyter_md, cell_metadata)
+            return complete
+
+        return deepcopy(metadata), cells, complete_metadata
+
+    def iter_cells(self, lines, cell_metadata=None):
+        """Iterate over the cells of a notebook read from a LineBuffer. The cells are
+        the same as in the notebook returned by reads, except for Markdown documents
+        with no kernel, where the main language is not inferred from the cells.
+        The metadata keys of the cells are added to cell_metadata, if not None"""
+        metadata, _, header_cell, pos = lines.header(self.implementation.header_prefix,
+                                                     self.implementation.extension)
+        default_language = default_language_from_metadata_and_ext(metadata, self.implementation.extension)
+        self.update_fmt_with_notebook_options(metadata)
+        language_metadata = {'kernelspec': metadata.get('kernelspec', {}),
+                             'jupytext': {'main_language': default_language}}
+
+        previous_cell = cell = None
+        is_sphinx = self.implementation.format_name and self.implementation.format_name.startswith('sphinx')
+        for next_cell in self._iter_raw_cells(lines, header_cell, pos, default_language):
+            if cell_metadata is not None:
+                cell_metadata.update(next_cell.metadata.keys())
+            set_main_and_cell_language(language_metadata, [next_cell], self.implementation.extension)
+            if cell is not None:
+                # Empty cells between two code cells are dropped in Sphinx
+                if not (is_sphinx and cell.source == '' and previous_cell is not None
+                        and previous_cell.cell_type != 'markdown' and next_cell.cell_type != 'markdown'):
+                    yield cell
+            previous_cell, cell = cell, next_cell
+
+        if cell is not None:
+            yield cell
+
+    def _iter_raw_cells(self, lines, header_cell, pos, default_language):
+        """Iterate over the cells of a LineBuffer, before the cell languages are set"""
+        if header_cell:
+            yield header_cell
+
+        if self.implementation.format_name and self.implementation.format_name.startswith('sphinx'):
+            yield new_code_cell(source='%matplotlib inline')
+
+        while True:
+            if pos >= len(lines.lines):
+                if lines.exhausted:
+                    return
+                pos = lines.read_more(pos)
+                continue
+
+            reader = self.implementation.cell_reader_class(self.fmt, default_language)
+            cell, next_pos = reader.read(lines.lines, pos, lines.line_types)
+
+            # Read more lines if the end of the cell depends on the lines that follow
+            if not lines.settled(next_pos):
+                pos = lines.read_more(pos)
+                continue
+
+            if next_pos <= pos:
+                raise Exception('Blocked at lines ' + '\n'.join(lines.lines[pos:pos + 6]))  # pragma: no cover
+            yield cell
+            pos = next_pos
 
     def writes(self, nb, metadata=None, **kwargs):
         """Return the text representation of the notebook"""
-        # Copy the notebook, in order to be sure we do not modify the original notebook
-        nb = new_notebook(cells=nb.cells, metadata=deepcopy(metadata or nb.metadata))
+        return '\n'.join(chain.from_iterable(self.iter_text(nb, metadata)))
+
+    def iter_text(self, nb, metadata=None, analysis=None):
+        """Return the text representation of the notebook, as an iterator over the lines
+        of the header and then of each cell. A cell is rendered as soon as the cells that
+        follow are known well enough, so only a window of the text is held in memory.
+        The analysis of the cells can be shared with the writers of other formats"""
+        # The header cell is removed from a shallow copy of the notebook. The metadata is copied
+        # only where the writer changes it
+        nb = copy(nb)
+        if metadata is None:
+            metadata = metadata_to_write(nb.metadata)
         default_language = default_language_from_metadata_and_ext(metadata, self.implementation.extension)
         self.update_fmt_with_notebook_options(metadata)
 
@@ -99,164 +661,546 @@ class TextNotebookConverter(NotebookReader, NotebookWriter):
                                                                                 self.implementation, self.ext)
         header.extend(header_content)
 
-        cell_exporters = []
-        looking_for_first_markdown_cell = (self.implementation.format_name and
-                                           self.implementation.format_name.startswith('sphinx'))
-        split_at_heading = self.fmt.get('split_at_heading', False)
+        window = CellTextWindow(self, nb.cells, default_language, analysis)
+        while header_lines_to_next_cell is None:
+            try:
+                header_lines_to_next_cell = pep8_lines_between_cells(header_content, WindowLines(window, 0),
+                                                                     self.implementation.extension)
+            except UnknownLines:
+                window.extend()
 
-        for cell in nb.cells:
-            if looking_for_first_markdown_cell and cell.cell_type == 'markdown':
-                cell.metadata.setdefault('cell_marker', '"""')
-                looking_for_first_markdown_cell = False
+        header.extend([''] * header_lines_to_next_cell)
+        yield header
 
-            cell_exporters.append(self.implementation.cell_exporter_class(cell, default_language, self.fmt))
+        # The start of cell marker is simplified when the previous cell ends with a blank line
+        previous_text = header
+        previous_is_dropped = False
+        for _ in nb.cells:
+            while not window.final or not window.final[0]:
+                window.extend()
+            cell, text, is_dropped = window.pop()
+            yield text if previous_is_dropped else cell.simplify_soc_marker(copy(text), previous_text)
+            previous_text, previous_is_dropped = text, is_dropped
 
-        texts = [cell.cell_to_text() for cell in cell_exporters]
-        lines = []
 
-        # concatenate cells in reverse order to determine how many blank lines (pep8)
-        for i, cell in reversed(list(enumerate(cell_exporters))):
-            text = cell.remove_eoc_marker(texts[i], lines)
+def reads(text, fmt, as_version=4, lazy=False, records=False, **kwargs):
+    """Read a notebook from a string. With lazy=True, text notebooks are returned
+    as a LazyNotebook, whose cells are read on first access. With records=True, text notebooks
+    are returned as a TextNotebook, which is not validated, and can only be written to text formats"""
+    fmt = copy(fmt)
+    fmt = long_form_one_format(fmt)
+    ext = fmt['extension']
 
-            if i == 0 and self.implementation.format_name and \
-                    self.implementation.format_name.startswith('sphinx') and \
-                    (text in [['%matplotlib inline'], ['# %matplotlib inline']]):
-                continue
+    if ext == '.ipynb':
+        return nbformat.reads(text, as_version, **kwargs)
 
-            lines_to_next_cell = cell.lines_to_next_cell
-            if lines_to_next_cell is None:
-                lines_to_next_cell = pep8_lines_between_cells(text, lines, self.implementation.extension)
+    # Split the text and parse the header only once
+    document = parsed_document(text, ext)
+    format_name = read_format_from_metadata(document, ext) or fmt.get('format_name') or guess_format(document, ext)
 
-            text.extend([''] * lines_to_next_cell)
+    if format_name:
+        fmt['format_name'] = format_name
 
-            # two blank lines between markdown cells in Rmd
-            if self.ext in ['.Rmd', '.md'] and not cell.is_code():
-                if i + 1 < len(cell_exporters) and not cell_exporters[i + 1].is_code() and (
-                        not split_at_heading or not (texts[i + 1] and texts[i + 1][0].startswith('#'))):
-                    text.append('')
+    reader = TextNotebookConverter(fmt)
+    if lazy:
+        metadata, cells, complete_metadata = reader.lazy_reads(document)
+        return LazyNotebook(rearrange_metadata(metadata, ext, format_name), cells,
+                            complete_metadata and (lambda: rearrange_metadata(complete_metadata(), ext, format_name)))
 
-            # "" between two consecutive code cells in sphinx
-            if self.implementation.format_name.startswith('sphinx') and cell.is_code():
-                if i + 1 < len(cell_exporters) and cell_exporters[i + 1].is_code():
-                    text.append('""')
+    if records:
+        notebook, _ = reader.reads_text_notebook(document, kwargs.get('processes'))
+    else:
+        notebook = reader.reads(document, **kwargs)
+    rearrange_metadata(notebook.metadata, ext, format_name)
+    return notebook
 
-            if i + 1 < len(cell_exporters):
-                lines = cell_exporters[i + 1].simplify_soc_marker(lines, text)
-            lines = text + lines
 
-        if header_lines_to_next_cell is None:
-            header_lines_to_next_cell = pep8_lines_between_cells(header_content, lines, self.implementation.extension)
+def metadata_to_write(metadata):
+    """Return a copy of the notebook metadata that the writer can modify. The writer only changes
+    the top level entries and the jupytext section, so the other entries (like the state of
+    the widgets) are shared with the notebook rather than copied"""
+    metadata = copy(metadata)
+    if isinstance(metadata.get('jupytext'), dict):
+        metadata['jupytext'] = copy(metadata['jupytext'])
+    return metadata
 
-        header.extend([''] * header_lines_to_next_cell)
 
-        if cell_exporters:
-            lines = cell_exporters[0].simplify_soc_marker(lines, header)
+def rearrange_metadata(metadata, ext, format_name):
+    """Rearrange the jupytext metadata of a notebook read from text, and record its text representation"""
+    rearrange_jupytext_metadata(metadata)
+    if format_name and insert_or_test_version_number():
+        metadata.setdefault('jupytext', {}).setdefault('text_representation', {}).update(
+            {'extension': ext, 'format_name': format_name})
+    return metadata
 
-        return '\n'.join(header + lines)
 
+class IncrementalReader(object):
+    """Read successive versions of a text notebook. The cells that do not depend on the lines
+    that changed since the previous version are not read again: the cells of the previous
+    notebook are reused. The notebooks are identical to the ones returned by reads.
+    Since the cells are shared between the successive notebooks, they should not be modified"""
 
-def reads(text, fmt, as_version=4, **kwargs):
-    """Read a notebook from a string"""
-    fmt = copy(fmt)
-    fmt = long_form_one_format(fmt)
+    def __init__(self, fmt):
+        self.fmt = copy(long_form_one_format(fmt))
+        self.ext = self.fmt['extension']
+        self.header = None
+        self.lines = []
+        self.cells = []
+        self.positions = []
+        self.windows = []
+        self.keys = []
+        self.languages = []
+        self.main_language = None
+
+    def reads(self, text):
+        """Read the new version of the notebook"""
+        fmt = copy(self.fmt)
+        document = parsed_document(text, self.ext)
+        format_name = read_format_from_metadata(document, self.ext) or fmt.get('format_name') or \
+            guess_format(document, self.ext)
+        if format_name:
+            fmt['format_name'] = format_name
+
+        # The Sphinx reader adds and removes cells depending on their neighbours
+        if format_name and format_name.startswith('sphinx'):
+            self.header = None
+            return reads(document, fmt)
+
+        converter = TextNotebookConverter(fmt)
+        metadata, jupyter_md, header_cell, pos = document.header(converter.implementation.header_prefix, self.ext)
+        default_language = default_language_from_metadata_and_ext(metadata, self.ext)
+        converter.update_fmt_with_notebook_options(metadata)
+
+        # The previous cells can be reused only if the header and the format are unchanged
+        header = deepcopy((converter.fmt, metadata, jupyter_md, pos))
+        if header != self.header:
+            self.header = header
+            self.lines = []
+            self.cells = []
+            self.positions = []
+            self.windows = []
+            self.keys = []
+            self.languages = []
+
+        lines = document.lines
+        line_types = LineTypes(lines)
+        head, tail, delta = self.unchanged_cells(lines)
+        if head:
+            pos = self.positions[head - 1][1]
+
+        cells = self.cells[:head]
+        positions = self.positions[:head]
+        windows = self.windows[:head]
+        keys = self.keys[:head]
+        languages = self.languages[:head]
+        new_cells = []
+        while pos < len(lines):
+            # Are we back to the start of an unchanged cell?
+            if pos - delta in tail:
+                old = tail[pos - delta]
+                cells.extend(self.cells[old:])
+                positions.extend((start + delta, next_cell + delta) for start, next_cell in self.positions[old:])
+                windows.extend(window + delta for window in self.windows[old:])
+                keys.extend(self.keys[old:])
+                languages.extend(self.languages[old:])
+                break
+
+            reader = converter.implementation.cell_reader_class(converter.fmt, default_language)
+            cell, next_pos = reader.read(lines, pos, line_types)
+            if next_pos <= pos:
+                raise Exception('Blocked at lines ' + '\n'.join(lines[pos:pos + 6]))  # pragma: no cover
+            cells.append(cell)
+            new_cells.append(cell)
+            positions.append((pos, next_pos))
+            windows.append(converter.chunk_end(lines, next_pos, line_types))
+            keys.append(tuple(cell.metadata.keys()))
+            languages.append(cell.metadata.get('language'))
+            pos = next_pos
+
+        # Without a kernel, the main language is the most frequent one among the cells
+        main_language = main_language_from_metadata_and_ext(metadata, self.ext) or \
+            most_frequent_language(language for language in languages if language is not None)
+        if len(new_cells) < len(cells) and main_language != self.main_language:
+            # The reused cells were read with another main language
+            self.header = None
+            return self.reads(document)
+
+        set_main_and_cell_language({'jupytext': {'main_language': main_language}}, new_cells, self.ext)
+
+        self.lines = lines
+        self.cells = cells
+        self.positions = positions
+        self.windows = windows
+        self.keys = keys
+        self.languages = languages
+        self.main_language = main_language
+
+        cell_metadata = set()
+        for cell_keys in keys:
+            cell_metadata.update(cell_keys)
+        update_metadata_filters(metadata, jupyter_md, cell_metadata)
+        if 'language' not in metadata.get('kernelspec', {}):
+            metadata.setdefault('jupytext', {})['main_language'] = main_language
+
+        # The rst2md option applies just once
+        if converter.fmt.get('rst2md'):
+            metadata['jupytext']['rst2md'] = False
+
+        notebook = new_notebook(metadata=rearrange_metadata(metadata, self.ext, format_name))
+        notebook.cells = [header_cell] + cells if header_cell else list(cells)
+        return notebook
+
+    def unchanged_cells(self, lines):
+        """Compare the new lines with the previous ones, and return the number of cells at the
+        start of the notebook that can be reused, a map from the first line of each reusable cell
+        at the end of the notebook to its index, and the number of lines added by the changes"""
+        old_lines = self.lines
+        size = min(len(lines), len(old_lines))
+        prefix = 0
+        while prefix < size and lines[prefix] == old_lines[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < size - prefix and lines[-1 - suffix] == old_lines[-1 - suffix]:
+            suffix += 1
+
+        # The cell readers look at the lines up to the window of the cell
+        # (the end of the document, if the window extends to it)
+        head = 0
+        while head < len(self.windows) and self.windows[head] <= prefix and \
+                (self.windows[head] < len(old_lines) or len(lines) == len(old_lines)):
+            head += 1
+
+        tail = {}
+        for index in range(len(self.positions) - 1, head - 1, -1):
+            start = self.positions[index][0]
+            if start < len(old_lines) - suffix:
+                break
+            tail[start] = index
+
+        return head, tail, len(lines) - len(old_lines)
+
+
+def iter_cells(file_or_stream, fmt, chunk_size=1000):
+    """Iterate over the cells of a notebook read from a stream. Text notebooks are read
+    by chunks of lines, and each cell is returned as soon as it is complete. Markdown
+    documents with no kernel are read at once, since their main language depends on all the cells"""
+    fmt = copy(long_form_one_format(fmt))
     ext = fmt['extension']
 
     if ext == '.ipynb':
-        return nbformat.reads(text, as_version, **kwargs)
+        for cell in read(file_or_stream, fmt).cells:
+            yield cell
+        return
 
-    format_name = read_format_from_metadata(text, ext) or fmt.get('format_name') or guess_format(text, ext)
+    lines = LineBuffer(file_or_stream, chunk_size, ext=ext)
+    lines.read_more()
 
+    # The format is found in the header, or guessed from the first lines of the document
+    lines.header(_SCRIPT_EXTENSIONS.get(ext, {}).get('comment', ''), ext)
+    document = parsed_document('\n'.join(lines.lines), ext)
+    format_name = read_format_from_metadata(document, ext) or fmt.get('format_name')
+    if not format_name:
+        # Read as many lines as guess_format scans, unless the lines read so far
+        # are enough to decide (no later line can turn a Hydrogen script into another format)
+        while ext in _SCRIPT_EXTENSIONS and not lines.exhausted and len(lines.lines) < _GUESS_FORMAT_MAX_LINES \
+                and _guess_format_from_lines(lines.lines, '\n'.join(lines.lines), ext) != 'hydrogen':
+            lines.read_more()
+        document = parsed_document('\n'.join(lines.lines), ext)
+        format_name = guess_format(document, ext)
     if format_name:
         fmt['format_name'] = format_name
 
-    reader = TextNotebookConverter(fmt)
-    notebook = reader.reads(text, **kwargs)
-    rearrange_jupytext_metadata(notebook.metadata)
+    # Without a kernel, the main language is the most frequent one among the cells
+    if not main_language_from_metadata_and_ext(read_header_metadata(document, ext), ext):
+        while not lines.exhausted:
+            lines.read_more()
+        for cell in reads(ParsedDocument(None, ext, lines=lines.lines), fmt).cells:
+            yield cell
+        return
 
-    if format_name and insert_or_test_version_number():
-        notebook.metadata.setdefault('jupytext', {}).setdefault('text_representation', {}).update(
-            {'extension': ext, 'format_name': format_name})
+    for cell in TextNotebookConverter(fmt).iter_cells(lines):
+        yield cell
 
-    return notebook
+
+def read_lines(file_or_stream, block_size=_READ_BLOCK_SIZE):
+    """Return the lines of an UTF-8 text file, given its path or a binary file object.
+    The file is memory mapped when possible, and decoded by blocks of lines,
+    so that the full text is never held in memory. ASCII blocks are decoded
+    with the (faster) ASCII codec"""
+    if isinstance(file_or_stream, (str, unicode)):
+        with io.open(file_or_stream, 'rb') as stream:
+            return read_lines(stream, block_size)
+
+    try:
+        data = mmap.mmap(file_or_stream.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, IOError, OSError, ValueError, io.UnsupportedOperation):
+        # Not a regular file, or an empty one
+        data = file_or_stream.read()
+
+    lines = []
+    try:
+        start = 0
+        while start < len(data):
+            # Blocks end at a line break, so the lines are the same as those of the full text
+            end = data.rfind(b'\n', start, start + block_size) + 1 or \
+                data.find(b'\n', start + block_size) + 1 or len(data)
+            block = data[start:end]
+            try:
+                text = block.decode('ascii')
+            except UnicodeDecodeError:
+                text = block.decode('utf-8')
+            lines.extend(text.splitlines())
+            start = end
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+    return lines
 
 
 def read(file_or_stream, fmt, as_version=4, **kwargs):
-    """Read a notebook from a file"""
+    """Read a notebook from a file. Text notebooks given as a path or as a binary
+    file object are decoded line by line with read_lines"""
     fmt = long_form_one_format(fmt)
     if fmt['extension'] == '.ipynb':
         notebook = nbformat.read(file_or_stream, as_version, **kwargs)
         rearrange_jupytext_metadata(notebook.metadata)
         return notebook
 
+    if isinstance(file_or_stream, (str, unicode)) or isinstance(file_or_stream.read(0), bytes):
+        document = ParsedDocument(None, fmt['extension'], lines=read_lines(file_or_stream))
+        return reads(document, fmt, **kwargs)
+
     return reads(file_or_stream.read(), fmt, **kwargs)
 
 
-def readf(nb_file, fmt=None):
-    """Read a notebook from the file with given name"""
+def readf(nb_file, fmt=None, records=False):
+    """Read a notebook from the file with given name. With records=True, text notebooks
+    are returned as a TextNotebook (see reads)"""
     if nb_file == '-':
         text = sys.stdin.read()
         fmt = fmt or divine_format(text)
-        return reads(text, fmt)
+        return reads(text, fmt, records=records)
 
     _, ext = os.path.splitext(nb_file)
     fmt = copy(fmt or {})
     fmt.update({'extension': ext})
+    if ext != '.ipynb':
+        return read(nb_file, fmt, as_version=4, records=records)
+
     with io.open(nb_file, encoding='utf-8') as stream:
         return read(stream, fmt, as_version=4)
 
 
-def writes(notebook, fmt, version=nbformat.NO_CONVERT, **kwargs):
-    """Write a notebook to a string"""
-    metadata = deepcopy(notebook.metadata)
+def read_metadata(nb_file):
+    """Read the metadata of the notebook with given name, without reading its cells. Only the
+    header of text notebooks is read, and only the end of the ipynb notebooks written by Jupyter"""
+    _, ext = os.path.splitext(nb_file)
+    if ext == '.ipynb':
+        metadata = read_ipynb_metadata(nb_file)
+        rearrange_jupytext_metadata(metadata)
+        return metadata
+
+    if ext in ['.md', '.Rmd']:
+        header_prefixes = ['']
+    else:
+        comment = _SCRIPT_EXTENSIONS.get(ext, {}).get('comment', '#')
+        header_prefixes = [comment, "#'"] if ext in ['.r', '.R'] else [comment]
+
+    with io.open(nb_file, encoding='utf-8') as stream:
+        lines = LineBuffer(stream, chunk_size=64)
+        for header_prefix in header_prefixes:
+            while not lines.exhausted and not parse_header(lines.lines, header_prefix, ext)[4]:
+                lines.read_more()
+
+    document = parsed_document('\n'.join(lines.lines), ext)
+    metadata = read_header_metadata(document, ext)
     rearrange_jupytext_metadata(metadata)
-    fmt = copy(fmt)
-    fmt = long_form_one_format(fmt, metadata)
-    ext = fmt['extension']
-    format_name = fmt.get('format_name')
 
-    if ext == '.ipynb':
-        # Remove jupytext section if empty
-        metadata.get('jupytext', {}).pop('text_representation', {})
-        if not metadata.get('jupytext', {}):
-            metadata.pop('jupytext', {})
-        return nbformat.writes(new_notebook(cells=notebook.cells, metadata=metadata), version, **kwargs)
+    format_name = format_name_for_ext(metadata, ext, explicit_default=False)
+    if format_name and insert_or_test_version_number():
+        metadata.setdefault('jupytext', {}).setdefault('text_representation', {}).update(
+            {'extension': ext, 'format_name': format_name})
 
-    if not format_name:
-        format_name = format_name_for_ext(metadata, ext, explicit_default=False)
+    return nbformat.from_dict(metadata)
 
-    if format_name:
-        fmt['format_name'] = format_name
-        update_jupytext_formats_metadata(metadata, fmt)
 
-    writer = TextNotebookConverter(fmt)
-    return writer.writes(notebook, metadata)
+# The notebook metadata, as written by nbformat (sorted keys, indent=1)
+_IPYNB_METADATA = b'\n "metadata": '
+
+
+def read_ipynb_metadata(nb_file, block_size=4096):
+    """Read the metadata of an ipynb notebook. The notebook metadata comes after the cells
+    in the files written by nbformat, so we read the file backwards until we find it"""
+    with io.open(nb_file, 'rb') as stream:
+        stream.seek(0, io.SEEK_END)
+        size = stream.tell()
+        tail_size = block_size
+        while True:
+            stream.seek(max(size - tail_size, 0))
+            tail = stream.read()
+            pos = tail.rfind(_IPYNB_METADATA)
+            if pos >= 0:
+                try:
+                    metadata, _ = json.JSONDecoder().raw_decode(tail[pos + len(_IPYNB_METADATA):].decode('utf-8'))
+                    if isinstance(metadata, dict):
+                        return nbformat.from_dict(metadata)
+                except ValueError:
+                    pass
+                break
+            if tail_size >= size:
+                break
+            tail_size *= 2
+
+    # Not a notebook written by nbformat: read the full notebook
+    with io.open(nb_file, encoding='utf-8') as stream:
+        return nbformat.read(stream, as_version=4).metadata
+
+
+def writes(notebook, fmt, version=nbformat.NO_CONVERT, **kwargs):
+    """Write a notebook to a string"""
+    return MultiFormatWriter(notebook).writes(fmt, version, **kwargs)
+
+
+def iter_text(notebook, fmt, version=nbformat.NO_CONVERT, **kwargs):
+    """Return the text of a notebook in the given format, as an iterator over lists of lines
+    (the header, and then the cells, for text notebooks). Joined with line breaks, the lines
+    are equal to the output of writes"""
+    return MultiFormatWriter(notebook).iter_text(fmt, version, **kwargs)
 
 
 def write(notebook, file_or_stream, fmt, version=nbformat.NO_CONVERT, **kwargs):
-    """Write a notebook to a file"""
-    # Python 2 compatibility
-    text = u'' + writes(notebook, fmt, version, **kwargs)
-    file_or_stream.write(text)
-    # Add final newline #165
-    if not text.endswith(u'\n'):
-        file_or_stream.write(u'\n')
+    """Write a notebook to a file. Text notebooks are written one cell at a time"""
+    MultiFormatWriter(notebook).write(file_or_stream, fmt, version, **kwargs)
 
 
-def writef(notebook, nb_file, fmt=None):
-    """Write a notebook to the file with given name"""
-    if nb_file == '-':
-        write(notebook, sys.stdout, fmt)
-        return
+def writef(notebook, nb_file, fmt=None, if_unchanged='write'):
+    """Write a notebook to the file with given name. With if_unchanged='touch' or 'skip', a file that
+    already has the same content is not written again, and its modification time is updated or not.
+    Return whether the file was written"""
+    return MultiFormatWriter(notebook).writef(nb_file, fmt, if_unchanged)
 
-    _, ext = os.path.splitext(nb_file)
-    fmt = copy(fmt or {})
-    fmt = long_form_one_format(fmt)
-    fmt.update({'extension': ext})
 
-    create_prefix_dir(nb_file, fmt)
+def file_has_text(nb_file, text):
+    """Does the file contain the given text, as written by io.open in text mode and encoded in UTF-8?
+    The size of the file is compared first, and then its hash, computed by blocks"""
+    content = text.replace(u'\n', os.linesep).encode('utf-8')
+    try:
+        if os.stat(nb_file).st_size != len(content):
+            return False
+        file_hash = hashlib.sha1()
+        with io.open(nb_file, 'rb') as stream:
+            for block in iter(lambda: stream.read(_READ_BLOCK_SIZE), b''):
+                file_hash.update(block)
+    except (IOError, OSError):
+        return False
+    return file_hash.digest() == hashlib.sha1(content).digest()
+
+
+def elide_unchanged_write(nb_file, text, if_unchanged):
+    """When the file already contains the given text, apply the if_unchanged policy
+    (update the modification time or not) and return True. Otherwise return False"""
+    if if_unchanged not in UNCHANGED_FILE_POLICIES:
+        raise ValueError("if_unchanged should be one of {}, not '{}'".format(UNCHANGED_FILE_POLICIES, if_unchanged))
+    if if_unchanged == 'write' or not file_has_text(nb_file, text):
+        return False
+    if if_unchanged == 'touch':
+        os.utime(nb_file, None)
+    return True
+
+
+class MultiFormatWriter(object):
+    """Write a notebook in one or more formats. The notebook metadata is rearranged, and the cells
+    are analysed (source lines, cell magics and filtered metadata), only once for all the formats.
+    The texts are identical to that of the module functions writes, write and writef"""
+
+    def __init__(self, notebook):
+        self.notebook = notebook
+        self.metadata = metadata_to_write(notebook.metadata)
+        rearrange_jupytext_metadata(self.metadata)
+        self.analysis = CellAnalysis()
+
+    def writes(self, fmt, version=nbformat.NO_CONVERT, **kwargs):
+        """Return the notebook in the given format, as a string"""
+        return '\n'.join(chain.from_iterable(self.iter_text(fmt, version, **kwargs)))
+
+    def iter_text(self, fmt, version=nbformat.NO_CONVERT, **kwargs):
+        """Return the text of the notebook in the given format, as an iterator over lists of lines"""
+        metadata = metadata_to_write(self.metadata)
+        fmt = copy(fmt)
+        fmt = long_form_one_format(fmt, metadata)
+        ext = fmt['extension']
+        format_name = fmt.get('format_name')
+
+        if ext == '.ipynb':
+            # Remove jupytext section if empty
+            metadata.get('jupytext', {}).pop('text_representation', {})
+            if not metadata.get('jupytext', {}):
+                metadata.pop('jupytext', {})
+            # The cells of a lazy notebook are read here, and the TextCell records are converted to cells
+            cells = [cell.to_notebook_node(validate=False) if isinstance(cell, TextCell) else cell
+                     for cell in self.notebook.cells]
+            return iter([[nbformat.writes(new_notebook(cells=cells, metadata=metadata), version, **kwargs)]])
+
+        if not format_name:
+            format_name = format_name_for_ext(metadata, ext, explicit_default=False)
+
+        if format_name:
+            fmt['format_name'] = format_name
+            update_jupytext_formats_metadata(metadata, fmt)
+
+        writer = TextNotebookConverter(fmt)
+        return writer.iter_text(self.notebook, metadata, self.analysis)
+
+    def write(self, file_or_stream, fmt, version=nbformat.NO_CONVERT, **kwargs):
+        """Write the notebook in the given format to a file. Text notebooks are written one cell at a time"""
+        started = False
+        ends_with_line_break = False
+        for lines in self.iter_text(fmt, version, **kwargs):
+            if not lines:
+                continue
+            # Python 2 compatibility
+            text = u'' + '\n'.join(lines)
+            if started:
+                text = u'\n' + text
+            file_or_stream.write(text)
+            started = True
+            ends_with_line_break = text.endswith(u'\n')
+
+        # Add final newline #165
+        if not ends_with_line_break:
+            file_or_stream.write(u'\n')
+
+    def writef(self, nb_file, fmt=None, if_unchanged='write'):
+        """Write the notebook in the given format to the file with given name, and return whether
+        the file was written. Unless if_unchanged='write', the text is first rendered in memory
+        and compared with the content of the file"""
+        if nb_file == '-':
+            self.write(sys.stdout, fmt)
+            return True
+
+        _, ext = os.path.splitext(nb_file)
+        fmt = copy(fmt or {})
+        fmt = long_form_one_format(fmt)
+        fmt.update({'extension': ext})
+
+        create_prefix_dir(nb_file, fmt)
+
+        if if_unchanged != 'write':
+            text = self.writes(fmt)
+            # Add final newline #165
+            if not text.endswith(u'\n'):
+                text += u'\n'
+            if elide_unchanged_write(nb_file, text, if_unchanged):
+                return False
+            with io.open(nb_file, 'w', encoding='utf-8') as stream:
+                # Python 2 compatibility
+                stream.write(u'' + text)
+            return True
 
-    with io.open(nb_file, 'w', encoding='utf-8') as stream:
-        write(notebook, stream, fmt)
+        with io.open(nb_file, 'w', encoding='utf-8') as stream:
+            self.write(stream, fmt)
+        return True
 
 
 def create_prefix_dir(nb_file, fmt):
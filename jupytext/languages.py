@@ -30,21 +30,31 @@ def default_language_from_metadata_and_ext(metadata, ext):
     return language
 
 
+def main_language_from_metadata_and_ext(metadata, ext):
+    """Return the main language given the notebook metadata and the file extension,
+    or None if the main language depends on the cells"""
+    return (metadata.get('kernelspec', {}).get('language') or
+            metadata.get('jupytext', {}).get('main_language') or
+            _SCRIPT_EXTENSIONS.get(ext, {}).get('language'))
+
+
+def most_frequent_language(languages):
+    """Return the most frequent language in the given cell languages (python, if none)"""
+    languages_count = {'python': 0.5}
+    for language in languages:
+        languages_count[language] = languages_count.get(language, 0.0) + 1
+
+    return max(languages_count, key=languages_count.get)
+
+
 def set_main_and_cell_language(metadata, cells, ext):
     """Set main language for the given collection of cells, and
     use magics for cells that use other languages"""
-    main_language = (metadata.get('kernelspec', {}).get('language') or
-                     metadata.get('jupytext', {}).get('main_language') or
-                     _SCRIPT_EXTENSIONS.get(ext, {}).get('language'))
+    main_language = main_language_from_metadata_and_ext(metadata, ext)
 
     if main_language is None:
-        languages = {'python': 0.5}
-        for cell in cells:
-            if 'language' in cell['metadata']:
-                language = cell['metadata']['language']
-                languages[language] = languages.get(language, 0.0) + 1
-
-        main_language = max(languages, key=languages.get)
+        main_language = most_frequent_language(cell.metadata['language'] for cell in cells
+                                               if 'language' in cell.metadata)
 
     # save main language when no kernel is set
     if 'language' not in metadata.get('kernelspec', {}):
@@ -52,14 +62,14 @@ def set_main_and_cell_language(metadata, cells, ext):
 
     # Remove 'language' meta data and add a magic if not main language
     for cell in cells:
-        if 'language' in cell['metadata']:
-            language = cell['metadata'].pop('language')
+        if 'language' in cell.metadata:
+            language = cell.metadata.pop('language')
             if language != main_language and language in _JUPYTER_LANGUAGES:
-                if 'magic_args' in cell['metadata']:
-                    magic_args = cell['metadata'].pop('magic_args')
-                    cell['source'] = u'%%{} {}\n'.format(language, magic_args) + cell['source']
+                if 'magic_args' in cell.metadata:
+                    magic_args = cell.metadata.pop('magic_args')
+                    cell.source = u'%%{} {}\n'.format(language, magic_args) + cell.source
                 else:
-                    cell['source'] = u'%%{}\n'.format(language) + cell['source']
+                    cell.source = u'%%{}\n'.format(language) + cell.source
 
 
 def cell_language(source):
@@ -86,46 +86,85 @@ def update_metadata_filters(metadata, jupyter_md, cell_metadata):
         metadata.setdefault('jupytext', {})['cell_metadata_filter'] = metadata_filter_as_string(cell_metadata)
 
 
-def apply_metadata_filters(user_filter, default_filter, actual_keys):
-    """Apply the filter and replace 'all' with the actual or filtered keys"""
+class MetadataFilter(object):
+    """A metadata filter compiled from the user and the default filters. The keys that the filter
+    keeps are the actual keys, intersected with the 'include' set (when it is not None), minus
+    the 'exclude' set"""
+    __slots__ = ('include', 'exclude')
+
+    def __init__(self, user_filter, default_filter):
+        default_filter = dict(metadata_filter_as_dict(default_filter) or {})
+        user_filter = dict(metadata_filter_as_dict(user_filter) or {})
+
+        for key in ['additional', 'excluded']:
+            default_filter.setdefault(key, [])
+            user_filter.setdefault(key, [])
+
+        if user_filter['excluded'] == 'all':
+            default_filter['additional'] = []
+        if user_filter['additional'] == 'all':
+            default_filter['excluded'] = []
+
+        user_additional = set(user_filter['additional'])
+        user_excluded = set(user_filter['excluded'])
+
+        # notebook default filter = only few metadata
+        if default_filter['additional']:
+            if user_filter['excluded'] == 'all':
+                self.include = None
+                self.exclude = frozenset(user_excluded)
+            else:
+                self.include = frozenset(user_additional.union(default_filter['additional']))
+                self.exclude = frozenset(user_excluded)
+        # cell default filter = all metadata but removed ones
+        elif user_filter['excluded'] == 'all':
+            self.include = frozenset(user_additional)
+            self.exclude = frozenset()
+        else:
+            self.include = None
+            self.exclude = frozenset(user_excluded.union(
+                set(default_filter['excluded']).difference(user_additional)))
 
-    default_filter = metadata_filter_as_dict(default_filter) or {}
-    user_filter = metadata_filter_as_dict(user_filter) or {}
+    def keep_keys(self, actual_keys):
+        """The keys that the filter keeps among the actual keys"""
+        if self.include is not None:
+            actual_keys = actual_keys.intersection(self.include)
+        return actual_keys.difference(self.exclude)
 
-    for key in ['additional', 'excluded']:
-        default_filter.setdefault(key, [])
-        user_filter.setdefault(key, [])
+    def filter(self, metadata):
+        """Remove the filtered keys from the metadata (in place), and return the metadata"""
+        for key in list(metadata):
+            if (self.include is not None and key not in self.include) or key in self.exclude:
+                metadata.pop(key)
 
-    if user_filter.get('excluded') == 'all':
-        default_filter['additional'] = []
-    if user_filter.get('additional') == 'all':
-        default_filter['excluded'] = []
+        return metadata
 
-    # notebook default filter = only few metadata
-    if default_filter.get('additional'):
-        if user_filter.get('excluded') == 'all':
-            return actual_keys.difference(user_filter.get('excluded'))
 
-        return (actual_keys
-                .intersection(set(user_filter.get('additional')).union(default_filter.get('additional')))
-                .difference(user_filter.get('excluded')))
+_METADATA_FILTERS = {}
 
-    # cell default filter = all metadata but removed ones
-    if user_filter.get('excluded') == 'all':
-        return actual_keys.intersection(user_filter.get('additional'))
 
-    return (actual_keys.difference(
-        set(user_filter.get('excluded')).union(set(default_filter.get('excluded'))
-                                               .difference(user_filter.get('additional')))))
+def compile_metadata_filter(user_filter, default_filter):
+    """The compiled metadata filter, cached by the user and the default filters"""
+    key = user_filter, default_filter
+    try:
+        return _METADATA_FILTERS[key]
+    except KeyError:
+        pass
+    except TypeError:
+        # Filters given as dictionaries are not hashable
+        return MetadataFilter(user_filter, default_filter)
 
+    if len(_METADATA_FILTERS) >= 1024:
+        _METADATA_FILTERS.clear()
+    metadata_filter = _METADATA_FILTERS[key] = MetadataFilter(user_filter, default_filter)
+    return metadata_filter
 
-def filter_metadata(metadata, user_filter, default_filter):
-    """Filter the cell or notebook metadata, according to the user preference"""
-    actual_keys = set(metadata.keys())
-    keep_keys = apply_metadata_filters(user_filter, default_filter, actual_keys)
 
-    for key in actual_keys:
-        if key not in keep_keys:
-            metadata.pop(key)
+def apply_metadata_filters(user_filter, default_filter, actual_keys):
+    """Apply the filter and replace 'all' with the actual or filtered keys"""
+    return compile_metadata_filter(user_filter, default_filter).keep_keys(actual_keys)
+
 
-    return metadata
+def filter_metadata(metadata, user_filter, default_filter):
+    """Filter the cell or notebook metadata, according to the user preference"""
+    return compile_metadata_filter(user_filter, default_filter).filter(metadata)
@@ -4,11 +4,14 @@ from .stringparser import StringParser
 
 def next_instruction_is_function_or_class(lines):
     """Is the first non-empty, non-commented line of the cell either a function or a class?"""
-    for i, line in enumerate(lines):
+    prev_blank = False
+    for line in lines:
         if not line.strip():  # empty line
-            if i > 0 and not lines[i - 1].strip():
+            if prev_blank:
                 return False
+            prev_blank = True
             continue
+        prev_blank = False
         if line.startswith('def ') or line.startswith('class '):
             return True
         if line.startswith(('#', '@', ' ')):
@@ -57,15 +60,18 @@ def cell_ends_with_code(lines):
 
 def cell_has_code(lines):
     """Is there any code in this cell?"""
-    for i, line in enumerate(lines):
+    prev_blank = False
+    for line in lines:
         stripped_line = line.strip()
         if stripped_line.startswith('#'):
+            prev_blank = False
             continue
 
         # Two consecutive blank lines?
         if not stripped_line:
-            if i > 0 and not lines[i - 1].strip():
+            if prev_blank:
                 return False
+            prev_blank = True
             continue
 
         return True
@@ -74,7 +80,8 @@ def cell_has_code(lines):
 
 
 def pep8_lines_between_cells(prev_lines, next_lines, ext):
-    """How many blank lines should be added between the two python paragraphs to make them pep8?"""
+    """How many blank lines should be added between the two python paragraphs to make them pep8?
+    The next lines are only iterated over, so they can be an iterator on the remaining lines"""
     if not next_lines:
         return 1
     if not prev_lines:
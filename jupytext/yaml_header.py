@@ -0,0 +1,188 @@
+"""Load and dump the YAML header of text notebooks. The usual headers (nested mappings of
+short strings, integers and booleans) are parsed and emitted directly, with the same result
+as PyYAML's safe loader and dumper. Other headers are processed by PyYAML, with the
+libyaml bindings when they are available"""
+
+import re
+import io
+import yaml
+import nbformat
+from yaml.emitter import Emitter
+from yaml.nodes import ScalarNode
+from yaml.resolver import Resolver
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+try:
+    unicode  # Python 2
+except NameError:
+    unicode = str  # Python 3
+
+_STR_TAG = u'tag:yaml.org,2002:str'
+_INT_TAG = u'tag:yaml.org,2002:int'
+_BOOL_TAG = u'tag:yaml.org,2002:bool'
+
+# The lines of the header that we parse without PyYAML
+_MAPPING_LINE = re.compile(r"^( *)([A-Za-z_][A-Za-z0-9_.-]*):(?: (.*))?$")
+_PLAIN_SCALAR = re.compile(r"^(?:[A-Za-z0-9_.(/]|-(?=[^ ]))[A-Za-z0-9_.,:/+()=-]*(?: [A-Za-z0-9_.,:/+()=-]+)*$")
+_SINGLE_QUOTED_SCALAR = re.compile(r"^'((?:[ -&(-~]|'')*)'$")
+_DECIMAL_INT = re.compile(r"^(?:0|-?[1-9][0-9]*)$")
+
+# The dumper writes the simple scalars on lines of at most that length, and keys shorter than that
+_MAX_LINE_LENGTH = 80
+_MAX_KEY_LENGTH = 100
+
+# The types that the safe dumper represents as mappings
+_MAPPING_TYPES = (dict, nbformat.NotebookNode)
+
+_RESOLVER = Resolver()
+_EMITTER = Emitter(io.StringIO())
+_SCALAR_STYLES = {}
+
+
+def _implicit_tag(value):
+    """The tag of the plain scalar"""
+    return _RESOLVER.resolve(ScalarNode, value, (True, False))
+
+
+def load(text):
+    """Load the YAML text, like yaml.safe_load"""
+    data = _load_simple_mapping(text)
+    if data is None:
+        data = yaml.load(text, Loader=SafeLoader)
+    return data
+
+
+def _load_simple_mapping(text):
+    """Parse the nested mappings of plain or single quoted scalars, with an indentation
+    of two spaces. Return None for any other YAML document"""
+    root = {}
+    # The mappings that contain the current line, with the indentation of their keys
+    stack = [(0, root)]
+    expect_mapping = False
+    for line in text.splitlines():
+        match = _MAPPING_LINE.match(line)
+        if not match:
+            return None
+        indent, key, value = match.groups()
+        indent = len(indent)
+        if not expect_mapping:
+            while len(stack) > 1 and indent < stack[-1][0]:
+                stack.pop()
+        if indent != stack[-1][0] or _implicit_tag(key) != _STR_TAG:
+            return None
+
+        mapping = stack[-1][1]
+        if value is None:
+            mapping[key] = {}
+            stack.append((indent + 2, mapping[key]))
+            expect_mapping = True
+            continue
+
+        scalar = _load_scalar(value)
+        if scalar is None:
+            return None
+        mapping[key] = scalar
+        expect_mapping = False
+
+    if expect_mapping or not root:
+        return None
+    return root
+
+
+def _load_scalar(value):
+    """The value of a plain or single quoted scalar (only strings, decimal integers
+    and booleans are supported). Return None for any other value"""
+    match = _SINGLE_QUOTED_SCALAR.match(value)
+    if match:
+        return match.group(1).replace("''", "'")
+
+    # A colon followed by a space or at the end of the line would start a mapping
+    if not _PLAIN_SCALAR.match(value) or ': ' in value or value.endswith(':'):
+        return None
+
+    tag = _implicit_tag(value)
+    if tag == _STR_TAG:
+        return value
+    if tag == _INT_TAG and _DECIMAL_INT.match(value):
+        return int(value)
+    if tag == _BOOL_TAG and value in ['true', 'false']:
+        return value == 'true'
+    return None
+
+
+def dump(data):
+    """Dump the data, like yaml.safe_dump(data, default_flow_style=False)"""
+    lines = []
+    if type(data) in _MAPPING_TYPES and _dump_simple_mapping(data, '', lines):
+        return u'\n'.join(lines) + u'\n'
+    return yaml.safe_dump(data, default_flow_style=False)
+
+
+def _dump_simple_mapping(mapping, indent, lines):
+    """Append the lines of the (non empty) mapping of strings, integers and booleans, or of
+    mappings of the same kind, to lines. Return False if the mapping has any other content"""
+    if not mapping:
+        return False
+    try:
+        keys = sorted(mapping)
+    except TypeError:
+        return False
+
+    for key in keys:
+        if type(key) not in (str, unicode) or len(key) > _MAX_KEY_LENGTH or _scalar_style(key) != '':
+            return False
+
+        value = mapping[key]
+        if type(value) in _MAPPING_TYPES:
+            lines.append(u'{}{}:'.format(indent, key))
+            if not _dump_simple_mapping(value, indent + '  ', lines):
+                return False
+            continue
+
+        if type(value) is bool:
+            scalar = u'true' if value else u'false'
+        elif type(value) is int:
+            scalar = u'{}'.format(value)
+        elif type(value) in (str, unicode):
+            style = _scalar_style(value)
+            if style == '':
+                scalar = value
+            elif style == "'":
+                scalar = u"'" + value.replace(u"'", u"''") + u"'"
+            else:
+                return False
+        else:
+            return False
+
+        line = u'{}{}: {}'.format(indent, key, scalar)
+        # Longer lines may be split by the dumper
+        if len(line) > _MAX_LINE_LENGTH:
+            return False
+        lines.append(line)
+
+    return True
+
+
+def _scalar_style(value):
+    """The style in which the dumper writes the string in a block mapping: '' (plain), "'"
+    (single quoted), or None for the other styles, which are left to the dumper"""
+    if value in _SCALAR_STYLES:
+        return _SCALAR_STYLES[value]
+
+    analysis = _EMITTER.analyze_scalar(value)
+    style = None
+    if analysis.multiline:
+        style = None
+    elif _implicit_tag(value) == _STR_TAG and analysis.allow_block_plain and not analysis.empty:
+        style = ''
+    elif analysis.allow_single_quoted:
+        style = "'"
+
+    if len(_SCALAR_STYLES) >= 4096:
+        _SCALAR_STYLES.clear()
+    _SCALAR_STYLES[value] = style
+    return style
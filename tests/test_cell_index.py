@@ -0,0 +1,92 @@
+# coding: utf-8
+import io
+import os
+import mock
+import pytest
+from testfixtures import compare
+import jupytext
+from jupytext.cell_index import cell_index, index_path
+from jupytext.cli import jupytext as jupytext_cli
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('ext', ['.py', '_percent.py', '_sphinx.py', '.R', '.md', '.Rmd'])
+def test_read_cell_same_as_readf(nb_file, ext, tmpdir):
+    fmt = {'_percent.py': 'py:percent', '_sphinx.py': 'py:sphinx'}.get(ext, ext)
+    tmp_file = str(tmpdir.join('notebook' + ext))
+    nb = jupytext.readf(nb_file)
+    jupytext.writef(nb, tmp_file, fmt)
+    nb = jupytext.readf(tmp_file)
+
+    index_dir = str(tmpdir.join('index'))
+    for i, cell in enumerate(nb.cells):
+        compare(cell, jupytext.read_cell(tmp_file, i, index_dir=index_dir))
+
+
+def test_read_cell_reads_only_the_lines_of_the_cell(tmpdir):
+    tmp_py = str(tmpdir.join('notebook.py'))
+    with io.open(tmp_py, 'w', encoding='utf-8') as fp:
+        fp.write(u'\n\n'.join(u'a{} = "é{}"'.format(i, i) for i in range(100)))
+
+    index_dir = str(tmpdir.join('index'))
+    assert jupytext.read_cell(tmp_py, 10, index_dir=index_dir).source == u'a10 = "é10"'
+
+    with mock.patch('jupytext.cell_index.build_cell_index') as build_cell_index:
+        assert jupytext.read_cell(tmp_py, 50, index_dir=index_dir).source == u'a50 = "é50"'
+        assert jupytext.read_cell(tmp_py, -1, index_dir=index_dir).source == u'a99 = "é99"'
+    build_cell_index.assert_not_called()
+
+    entry = cell_index(tmp_py, index_dir=index_dir)['cells'][50]
+    compare(entry['lines'], [100, 102])
+    compare(entry['cell_type'], 'code')
+
+
+def test_cell_index_is_rebuilt_when_the_notebook_changes(tmpdir):
+    tmp_md = str(tmpdir.join('notebook.md'))
+    index_dir = str(tmpdir.join('index'))
+    with open(tmp_md, 'w') as fp:
+        fp.write('First cell\n\n```python\n1 + 1\n```\n')
+    assert jupytext.read_cell(tmp_md, 1, index_dir=index_dir).source == '1 + 1'
+    assert os.path.isfile(index_path(tmp_md, index_dir))
+
+    with open(tmp_md, 'w') as fp:
+        fp.write('A longer first cell\n\n```python\n2 + 2\n```\n')
+    assert jupytext.read_cell(tmp_md, 1, index_dir=index_dir).source == '2 + 2'
+
+
+def test_cli_cell(tmpdir, capsys):
+    tmp_py = str(tmpdir.join('notebook.py'))
+    with open(tmp_py, 'w') as fp:
+        fp.write('# %%\n1 + 1\n\n# %% [markdown]\n# A markdown cell\n')
+
+    with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(tmpdir.join('cache'))}):
+        jupytext_cli([tmp_py, '--cell', '1'])
+
+    out, err = capsys.readouterr()
+    assert not err
+    compare(out, 'A markdown cell\n')
+
+
+def test_cli_cell_does_not_apply_to_stdin():
+    with pytest.raises(ValueError, match='stdin'):
+        jupytext_cli(['-', '--cell', '0'])
+
+
+@pytest.mark.parametrize('ext', ['.py', '.ipynb'])
+def test_cli_cell_out_of_range(ext, tmpdir):
+    tmp_file = str(tmpdir.join('notebook' + ext))
+    jupytext.writef(jupytext.reads('# %%\n1 + 1\n\n# %%\n2 + 2\n', 'py:percent'), tmp_file)
+
+    with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': str(tmpdir.join('cache'))}):
+        with pytest.raises(ValueError, match='has 2 cell'):
+            jupytext_cli([tmp_file, '--cell', '5'])
+
+
+def test_cli_cell_negative_index(tmpdir):
+    tmp_py = str(tmpdir.join('notebook.py'))
+    with open(tmp_py, 'w') as fp:
+        fp.write('# %%\n1 + 1\n\n# %%\n2 + 2\n')
+
+    with pytest.raises(ValueError, match='non-negative'):
+        jupytext_cli([tmp_py, '--cell', '-1'])
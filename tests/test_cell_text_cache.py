@@ -0,0 +1,89 @@
+import pytest
+from testfixtures import compare
+from nbformat.v4.nbbase import new_notebook, new_code_cell, new_markdown_cell, new_raw_cell
+import jupytext
+from jupytext.cell_to_text import CellTextCache, CELL_TEXT_CACHE, LightScriptCellExporter
+from .utils import list_notebooks
+
+
+def notebook_with_many_cells():
+    return new_notebook(cells=[new_code_cell(u'def f{}(x):\n    return x'.format(i)) if i % 2 else
+                               new_markdown_cell(u'Markdown cell {}'.format(i)) for i in range(20)])
+
+
+def test_second_save_uses_the_cache():
+    CELL_TEXT_CACHE.clear()
+    nb = notebook_with_many_cells()
+    text = jupytext.writes(nb, 'py:percent')
+    assert CELL_TEXT_CACHE.hits == 0
+    assert CELL_TEXT_CACHE.misses == 20
+
+    compare(text, jupytext.writes(nb, 'py:percent'))
+    assert CELL_TEXT_CACHE.hits == 20
+    assert CELL_TEXT_CACHE.misses == 20
+
+
+def test_save_after_one_cell_edit_renders_one_cell():
+    CELL_TEXT_CACHE.clear()
+    nb = notebook_with_many_cells()
+    jupytext.writes(nb, 'py:light')
+    nb.cells[5].source = u'def f5(x):\n    return x + 1'
+    jupytext.writes(nb, 'py:light')
+    assert CELL_TEXT_CACHE.misses == 21
+    assert CELL_TEXT_CACHE.hits == 19
+
+
+def test_cache_depends_on_format_options_and_metadata():
+    CELL_TEXT_CACHE.clear()
+    nb = new_notebook(cells=[new_code_cell('%matplotlib inline'), new_raw_cell('raw', metadata={'key': 'value'})])
+    jupytext.writes(nb, 'py:light')
+    jupytext.writes(nb, {'extension': '.py', 'format_name': 'light', 'comment_magics': False})
+    nb.cells[1].metadata['key'] = 'other value'
+    jupytext.writes(nb, 'py:light')
+    assert CELL_TEXT_CACHE.hits == 1
+    assert CELL_TEXT_CACHE.misses == 5
+
+
+def test_cache_is_bounded():
+    cache = CellTextCache(maxsize=2)
+    for i in range(3):
+        cache.cell_to_text(LightScriptCellExporter(new_code_cell(str(i)), 'python', {'extension': '.py'}))
+    assert len(cache) == 2
+    cache.cell_to_text(LightScriptCellExporter(new_code_cell('0'), 'python', {'extension': '.py'}))
+    assert cache.misses == 4
+
+
+def test_cached_text_is_not_modified_by_the_caller():
+    cache = CellTextCache()
+    text = cache.cell_to_text(LightScriptCellExporter(new_code_cell('1 + 1'), 'python', {'extension': '.py'}))
+    text.append('modified')
+    compare(['1 + 1'], cache.cell_to_text(LightScriptCellExporter(new_code_cell('1 + 1'), 'python',
+                                                                  {'extension': '.py'})))
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['py:light', 'py:percent', 'py:sphinx', 'R:spin', 'md', 'Rmd'])
+def test_cached_text_is_identical(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    CELL_TEXT_CACHE.clear()
+    text = jupytext.writes(nb, fmt)
+    misses = CELL_TEXT_CACHE.misses
+    compare(text, jupytext.writes(nb, fmt))
+    assert CELL_TEXT_CACHE.misses == misses
+
+
+def test_cache_depends_on_metadata_order():
+    CELL_TEXT_CACHE.clear()
+    nb = new_notebook(cells=[new_code_cell('1 + 1', metadata={'a': 1, 'b': 2}),
+                             new_code_cell('1 + 1', metadata={'b': 2, 'a': 1})])
+    text = jupytext.writes(nb, 'Rmd')
+    assert 'a=1, b=2' in text
+    assert 'b=2, a=1' in text
+
+
+def test_cache_depends_on_cell_language():
+    CELL_TEXT_CACHE.clear()
+    nb = new_notebook(cells=[new_code_cell('%%bash\nls'), new_code_cell('%%R\nls')])
+    text = jupytext.writes(nb, 'Rmd')
+    assert '```{bash}' in text
+    assert '```{r}' in text
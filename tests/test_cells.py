@@ -1,7 +1,10 @@
-from nbformat.v4.nbbase import new_markdown_cell
+import re
+import pickle
+from nbformat.v4.nbbase import new_markdown_cell, new_code_cell, new_raw_cell
 from jupytext.cell_reader import RMarkdownCellReader, LightScriptCellReader, \
-    uncomment
-from jupytext.cell_to_text import RMarkdownCellExporter
+    SphinxGalleryScriptCellReader, DoublePercentScriptCellReader, LineTypes, TextCell, uncomment, \
+    whole_document_pattern
+from jupytext.cell_to_text import RMarkdownCellExporter, LightScriptCellExporter, endofcell_marker
 
 
 def test_uncomment():
@@ -151,3 +154,119 @@ def test_code_to_cell():
     assert cell.source == '''def f(x):\n    return x+1'''
     assert cell.metadata == {}
     assert pos == 2
+
+
+def test_read_cell_at_given_position():
+    text = '''1 + 1
+
+def f(x):
+    return x + 1
+
+
+# +
+g = f
+'''
+    lines = text.splitlines()
+    cell, pos = LightScriptCellReader().read(lines, 2)
+    assert cell.cell_type == 'code'
+    assert cell.source == '''def f(x):\n    return x + 1'''
+    assert pos == 6
+
+    cell_on_slice, pos_on_slice = LightScriptCellReader().read(lines[2:])
+    assert cell_on_slice == cell
+    assert pos_on_slice + 2 == pos
+
+
+def test_read_sphinx_cell_does_not_modify_lines():
+    lines = ['1 + 1', '', '"""Markdown', 'text"""', '', '2 + 2']
+    org_lines = list(lines)
+    cell, pos = SphinxGalleryScriptCellReader({'extension': '.py'}).read(lines, 2)
+    assert cell.cell_type == 'markdown'
+    assert cell.source == 'Markdown\ntext'
+    assert pos == 5
+    assert lines == org_lines
+
+
+def test_line_types():
+    lines = ['def f(x):', '', '    # comment', '', '    return x', '', '1 + 1']
+    line_types = LineTypes(lines)
+    assert line_types.blank == [False, True, False, True, False, True, False]
+    assert line_types.next_code_is_indented(1)
+    assert not line_types.next_code_is_indented(5)
+    assert not line_types.next_code_is_indented(7)
+
+    start_code_re = re.compile(r'^1 \+')
+    assert line_types.match(start_code_re) == [False] * 6 + [True]
+    assert line_types.next_match(start_code_re, 0) == 6
+    assert line_types.next_match(start_code_re, 7) == 7
+
+
+def test_read_cells_with_shared_line_types():
+    lines = ['def f(x):', '', '    return x', '', '1 + 1']
+    line_types = LineTypes(lines)
+    cell, pos = LightScriptCellReader().read(lines, 0, line_types)
+    assert cell.source == 'def f(x):\n\n    return x'
+    assert pos == 4
+    cell, pos = LightScriptCellReader().read(lines, pos, line_types)
+    assert cell.source == '1 + 1'
+    assert pos == 5
+
+
+def test_line_types_scan_whole_document():
+    lines = ['# %% cell one', 'a = 1', '', '#  %%', '  # %% not a marker', '# In[2]:', '"""', '# %%', '"""']
+    reader = DoublePercentScriptCellReader({'extension': '.py'})
+    line_types = LineTypes(lines)
+    assert line_types.match(reader.cell_marker_re) == [bool(reader.cell_marker_re.match(line)) for line in lines]
+    assert reader.find_cell_starts(lines, 0, line_types) == [3, 5, 7]
+    assert line_types.blank == [False, False, True, False, False, False, False, False, False]
+
+
+def test_whole_document_pattern():
+    assert whole_document_pattern(re.compile(r'^#\s*%%$')).pattern == r'^(?:^#[^\S\n]*%%$)'
+    assert whole_document_pattern(re.compile(r'^[^\s#@]')) is None
+    assert whole_document_pattern(re.compile(r'^a\nb')) is None
+    assert whole_document_pattern(re.compile(r'^a', re.IGNORECASE)) is None
+
+
+def test_endofcell_marker():
+    assert endofcell_marker(['1 + 1'], '#') == '-'
+    assert endofcell_marker(['# -', '# --  ', '#  ---', '# ---x'], '#') == '---'
+    assert endofcell_marker(['# ' + '-' * (i % 300 + 1) for i in range(3000)], '#') == '-' * 301
+    assert endofcell_marker(['// -', '# --'], '//') == '--'
+
+
+def test_explicit_start_marker_with_many_dash_lines():
+    source = ['# ' + '-' * (i % 50 + 1) for i in range(500)] + ['', 'x = 1']
+    exporter = LightScriptCellExporter(new_code_cell('\n'.join(source)), 'python', {'extension': '.py'})
+    text = exporter.cell_to_text()
+    assert text[0] == '# + {"endofcell": "' + '-' * 51 + '"}'
+    assert text[-1] == '# ' + '-' * 51
+    assert not LightScriptCellReader({'extension': '.py'}).is_single_cell(source)
+    assert LightScriptCellReader({'extension': '.py'}).is_single_cell(['def f(x):', '', '    return x'])
+
+
+def test_read_text_cell():
+    lines = ['# + {"tags": ["parameters"]}', 'a = 1', '# -', '', '# Markdown']
+    cell, pos = LightScriptCellReader({'extension': '.py'}, 'python').read_text_cell(lines)
+    assert isinstance(cell, TextCell)
+    assert cell.cell_type == 'code'
+    assert cell.source == 'a = 1'
+    assert cell.metadata == {'tags': ['parameters'], 'language': 'python'}
+    assert pos == 4
+    assert LightScriptCellReader({'extension': '.py'}, 'python').read(lines) == (cell.to_notebook_node(), pos)
+
+
+def test_text_cell_to_notebook_node():
+    for cell_type, new_cell in [('code', new_code_cell), ('markdown', new_markdown_cell), ('raw', new_raw_cell)]:
+        expected = new_cell(source='text', metadata={'key': {'nested': 'value'}})
+        cell = TextCell(cell_type, 'text', {'key': {'nested': 'value'}})
+        assert cell.to_notebook_node() == expected
+        assert cell.to_notebook_node(validate=False) == expected
+        assert cell.to_notebook_node(validate=False).metadata.key.nested == 'value'
+
+
+def test_text_cell_is_compact_and_can_be_pickled():
+    cell = TextCell('code', '1 + 1', {})
+    assert not hasattr(cell, '__dict__')
+    cell = pickle.loads(pickle.dumps(cell))
+    assert (cell.cell_type, cell.source, cell.metadata) == ('code', '1 + 1', {})
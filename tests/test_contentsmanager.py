@@ -4,12 +4,13 @@ import os
 import time
 import pytest
 import itertools
+import mock
 import shutil
-from nbformat.v4.nbbase import new_notebook, new_markdown_cell
+from nbformat.v4.nbbase import new_notebook, new_markdown_cell, new_code_cell
 from tornado.web import HTTPError
 from testfixtures import compare
 import jupytext
-from jupytext.jupytext import writes, writef, readf
+from jupytext.jupytext import writes, writef, readf, MultiFormatWriter
 from jupytext.compare import compare_notebooks
 from jupytext.header import header_to_metadata_and_cell
 from jupytext.formats import read_format_from_metadata, auto_ext_from_metadata
@@ -1134,3 +1135,83 @@ def test_share_py_recreate_ipynb(tmpdir, nb_file):
 
     # ipynb is re-created
     assert os.path.isfile(tmp_ipynb)
+
+
+def test_format_cache(tmpdir):
+    tmp_py = str(tmpdir.join('notebook.py'))
+    with open(tmp_py, 'w') as fp:
+        fp.write('# %%\n1 + 1\n\n# %%\n2 + 2\n')
+
+    cm = jupytext.TextFileContentsManager()
+    cm.root_dir = str(tmpdir)
+    nb = cm.get('notebook.py')['content']
+    assert (cm.format_cache.hits, cm.format_cache.misses) == (0, 1)
+    assert nb.metadata['jupytext']['text_representation']['format_name'] == 'percent'
+
+    with mock.patch('jupytext.contentsmanager.guess_format') as guess_format:
+        compare(nb, cm.get('notebook.py')['content'])
+        guess_format.assert_not_called()
+    assert (cm.format_cache.hits, cm.format_cache.misses) == (1, 1)
+
+    # The cache is invalidated when the notebook is saved
+    cm.save(model=dict(type='notebook', content=nb), path='notebook.py')
+    assert len(cm.format_cache) == 0
+    cm.get('notebook.py')
+    assert (cm.format_cache.hits, cm.format_cache.misses) == (1, 2)
+
+    # and when it is renamed
+    cm.rename_file('notebook.py', 'new.py')
+    assert len(cm.format_cache) == 0
+    cm.get('new.py')
+    assert (cm.format_cache.hits, cm.format_cache.misses) == (1, 3)
+
+
+def test_format_cache_depends_on_file_size_and_modification_time(tmpdir):
+    tmp_py = str(tmpdir.join('notebook.py'))
+    with open(tmp_py, 'w') as fp:
+        fp.write('# %%\n1 + 1\n')
+
+    cm = jupytext.TextFileContentsManager()
+    cm.root_dir = str(tmpdir)
+    assert len(cm.get('notebook.py')['content'].cells) == 1
+
+    with open(tmp_py, 'w') as fp:
+        fp.write('1 + 1\n\n\n2 + 2\n')
+    os.utime(tmp_py, (1000000000, 1000000000))
+    nb = cm.get('notebook.py')['content']
+    assert (cm.format_cache.hits, cm.format_cache.misses) == (0, 2)
+    assert nb.metadata['jupytext']['text_representation']['format_name'] == 'light'
+    assert len(nb.cells) == 2
+
+
+def test_format_cache_is_bounded(tmpdir):
+    cm = jupytext.TextFileContentsManager()
+    cm.root_dir = str(tmpdir)
+    cm.format_cache.maxsize = 2
+    for i in range(3):
+        with open(str(tmpdir.join('notebook{}.py'.format(i))), 'w') as fp:
+            fp.write('1 + {}\n'.format(i))
+        cm.get('notebook{}.py'.format(i))
+    assert len(cm.format_cache) == 2
+
+
+@pytest.mark.parametrize('formats', ['ipynb,py:percent', 'py:percent,md'])
+def test_paired_files_have_the_changes_of_the_pre_save_hook(formats, tmpdir):
+    def pre_save_hook(model, **kwargs):
+        for cell in model['content'].cells:
+            cell.source = cell.source.replace('x=1', 'x = 1')
+
+    cm = jupytext.TextFileContentsManager()
+    cm.root_dir = str(tmpdir)
+    cm.pre_save_hook = pre_save_hook
+
+    nb = new_notebook(cells=[new_code_cell('x=1')], metadata={'jupytext': {'formats': formats}})
+    with mock.patch('jupytext.contentsmanager.MultiFormatWriter', side_effect=MultiFormatWriter) as writer:
+        cm.save(model=dict(type='notebook', content=nb), path='notebook.' + formats.split(',')[0].split(':')[0])
+    assert writer.call_count == 1
+
+    with open(str(tmpdir.join('notebook.py'))) as stream:
+        assert 'x = 1' in stream.read().splitlines()
+    if formats.endswith('md'):
+        with open(str(tmpdir.join('notebook.md'))) as stream:
+            assert 'x = 1' in stream.read().splitlines()
@@ -1,3 +1,4 @@
+import mock
 import pytest
 from testfixtures import compare
 from nbformat.v4.nbbase import new_notebook
@@ -5,6 +6,9 @@ import jupytext
 from jupytext.formats import guess_format, divine_format, read_format_from_metadata, rearrange_jupytext_metadata
 from jupytext.formats import long_form_multiple_formats, short_form_multiple_formats, update_jupytext_formats_metadata
 from jupytext.formats import get_format_implementation, validate_one_format, JupytextFormatError
+from jupytext.formats import parse_one_format, parse_multiple_formats, long_form_one_format, short_form_one_format
+from jupytext.formats import FormatRegistry, ParsedFormat, NotebookFormatDescription, JUPYTEXT_FORMATS
+from jupytext.formats import _GUESSED_FORMATS, _GUESS_FORMAT_MAX_LINES
 from .utils import list_notebooks
 
 
@@ -54,6 +58,51 @@ with one code block
 ;; ---''') == 'ss:percent'
 
 
+def test_guess_format_stops_at_cell_markers_and_magics():
+    _GUESSED_FORMATS.clear()
+    text = '# %%\n%matplotlib inline\n' + '1 + 1\n' * 1000
+    with mock.patch('jupytext.formats.StringParser.read_line') as read_line:
+        read_line.return_value = None
+        assert guess_format(text, '.py') == 'hydrogen'
+    assert read_line.call_count == 2
+
+
+def test_guess_format_skips_scripts_without_markers():
+    _GUESSED_FORMATS.clear()
+    with mock.patch('jupytext.formats.StringParser') as parser:
+        assert guess_format('def f(x):\n    return "%d" % x\n', '.py') == 'light'
+        assert guess_format("#' A spin comment\n1 + 1\n", '.py') == 'light'
+    parser.assert_not_called()
+
+
+def test_guess_format_scans_a_bounded_number_of_lines():
+    text = '1 + 1\n' * _GUESS_FORMAT_MAX_LINES
+    assert guess_format(text + '# %%\n', '.py') == 'light'
+    assert guess_format('# %%\n' + text, '.py') == 'percent'
+
+
+def test_guessed_formats_are_cached_by_content():
+    _GUESSED_FORMATS.clear()
+    text = '# %%\n1 + 1\n'
+    assert guess_format(text, '.py') == 'percent'
+    with mock.patch('jupytext.formats._guess_format_from_lines') as guess:
+        assert guess_format(text, '.py') == 'percent'
+        guess.assert_not_called()
+        guess.return_value = 'percent'
+        assert guess_format(text, '.jl') == 'percent'
+        guess.assert_called_once()
+    assert len(_GUESSED_FORMATS) == 2
+
+
+def test_divine_format_does_not_read_scripts_as_json():
+    with mock.patch('nbformat.reads') as reads, mock.patch('json.loads') as loads:
+        assert divine_format('# %%\n1 + 1\n') == 'py:percent'
+    reads.assert_not_called()
+    loads.assert_not_called()
+    assert divine_format('{"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 2}') == 'ipynb'
+    assert divine_format('{1 + 1\n}\n') == 'py:light'
+
+
 def test_get_format_implementation():
     assert get_format_implementation('.py').format_name == 'light'
     assert get_format_implementation('.py', 'percent').format_name == 'percent'
@@ -61,6 +110,52 @@ def test_get_format_implementation():
         get_format_implementation('.py', 'wrong_format')
 
 
+def test_format_registry_is_updated_when_formats_are_added():
+    formats = list(JUPYTEXT_FORMATS)
+    registry = FormatRegistry(formats)
+    assert registry.get('.py', 'percent').format_name == 'percent'
+    assert registry.get('.py', 'new_format') is None
+
+    new_format = NotebookFormatDescription('new_format', '.py', '#', None, None, '1.0')
+    formats.append(new_format)
+    assert registry.get('.py', 'new_format') is new_format
+    assert registry.formats_for_extension('.py')[0].format_name == 'light'
+    assert registry.formats_for_extension('.txt') == []
+
+
+def test_parsed_formats_are_memoized_and_frozen():
+    fmt = parse_one_format('prefix/sfx.py:percent')
+    assert fmt is parse_one_format('prefix/sfx.py:percent')
+    assert fmt == {'prefix': 'prefix', 'suffix': 'sfx', 'extension': '.py', 'format_name': 'percent'}
+    assert hash(fmt) == hash(ParsedFormat({'extension': '.py', 'format_name': 'percent', 'suffix': 'sfx',
+                                           'prefix': 'prefix'}))
+    with pytest.raises(TypeError):
+        fmt['format_name'] = 'light'
+    assert short_form_one_format(fmt) == 'prefix/sfx.py:percent'
+    assert parse_multiple_formats('ipynb,py:percent') is parse_multiple_formats('ipynb,py:percent')
+
+
+def test_long_forms_are_not_shared():
+    fmt = long_form_one_format('py:percent')
+    fmt['format_name'] = 'light'
+    compare({'extension': '.py', 'format_name': 'percent'}, long_form_one_format('py:percent'))
+    compare({'extension': '.py', 'format_name': 'percent'}, long_form_one_format(parse_one_format('py:percent')))
+
+    formats = long_form_multiple_formats('ipynb,py:percent')
+    formats[1]['format_name'] = 'light'
+    compare([{'extension': '.ipynb'}, {'extension': '.py', 'format_name': 'percent'}],
+            long_form_multiple_formats('ipynb,py:percent'))
+
+
+def test_invalid_formats_are_not_memoized():
+    for _ in range(2):
+        with pytest.raises(JupytextFormatError):
+            long_form_multiple_formats('ipynb,txt')
+    compare([{'extension': '.ipynb'}, {'extension': '.R'}],
+            long_form_multiple_formats('ipynb,auto', {'language_info': {'file_extension': '.r'}}))
+    compare([{'extension': '.ipynb'}, {'extension': '.auto'}], long_form_multiple_formats('ipynb,auto'))
+
+
 def test_script_with_magics_not_percent(script="""# %%time
 1 + 2"""):
     assert guess_format(script, '.py') == 'light'
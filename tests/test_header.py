@@ -2,7 +2,8 @@ from nbformat.v4.nbbase import new_notebook, new_raw_cell, new_markdown_cell
 import mock
 from testfixtures import compare
 import jupytext
-from jupytext.header import uncomment_line, header_to_metadata_and_cell, metadata_and_cell_to_header
+from jupytext.header import uncomment_line, header_to_metadata_and_cell, metadata_and_cell_to_header, \
+    ParsedDocument
 from jupytext.formats import get_format_implementation
 
 
@@ -102,3 +103,44 @@ def test_notebook_from_plain_script_has_metadata_filter(script="""print('Hello w
     scripts2 = jupytext.writes(nb, '.py')
 
     compare(script, scripts2)
+
+
+def test_header_is_parsed_only_once():
+    text = """# ---
+# jupyter:
+#   jupytext:
+#     formats: ipynb,py:percent
+#   kernelspec:
+#     display_name: Python 3
+#     language: python
+#     name: python3
+# ---
+
+# %%
+1 + 1
+"""
+    yaml_load = jupytext.header.yaml_header.load
+    with mock.patch('jupytext.header.yaml_header.load', side_effect=yaml_load) as mock_load:
+        nb = jupytext.reads(text, 'py')
+
+    assert mock_load.call_count == 1
+    assert nb.metadata['jupytext']['formats'] == 'ipynb,py:percent'
+
+
+def test_parsed_document_returns_copies_of_the_header():
+    document = ParsedDocument("""---
+title: Sample header
+jupyter:
+  mainlanguage: python
+---
+""", '.md')
+    metadata, _, cell, pos = document.header('')
+    metadata['mainlanguage'] = 'R'
+    cell.source = ''
+
+    metadata, _, cell, pos = document.header('')
+    assert metadata == {'mainlanguage': 'python'}
+    assert cell.source == """---
+title: Sample header
+---"""
+    assert pos == len(document.lines)
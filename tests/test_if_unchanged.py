@@ -0,0 +1,111 @@
+import os
+import pytest
+from testfixtures import compare
+import jupytext
+from jupytext import readf, writef
+from jupytext.cli import jupytext as jupytext_cli
+from jupytext.jupytext import file_has_text
+from .utils import list_notebooks
+
+
+def set_mtime(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py')[:3])
+@pytest.mark.parametrize('ext', ['.ipynb', '.py', '.md'])
+def test_writef_skips_unchanged_files(nb_file, ext, tmpdir):
+    nb = readf(nb_file)
+    tmp_file = str(tmpdir.join('notebook' + ext))
+    assert writef(nb, tmp_file, if_unchanged='skip')
+    with open(tmp_file) as stream:
+        text = stream.read()
+
+    set_mtime(tmp_file, 1000000000)
+    assert not writef(nb, tmp_file, if_unchanged='skip')
+    assert os.stat(tmp_file).st_mtime == 1000000000
+
+    assert not writef(nb, tmp_file, if_unchanged='touch')
+    assert os.stat(tmp_file).st_mtime > 1000000000
+
+    set_mtime(tmp_file, 1000000000)
+    assert writef(nb, tmp_file)
+    assert os.stat(tmp_file).st_mtime > 1000000000
+
+    with open(tmp_file) as stream:
+        compare(text, stream.read())
+
+
+def test_writef_writes_changed_files(tmpdir):
+    nb = readf(list_notebooks('ipynb_py')[0])
+    tmp_py = str(tmpdir.join('notebook.py'))
+    writef(nb, tmp_py)
+    nb.cells[-1].source += '\n# new line'
+    assert writef(nb, tmp_py, if_unchanged='skip')
+    compare(jupytext.writes(nb, 'py').rstrip('\n') + '\n', tmpdir.join('notebook.py').read())
+
+
+def test_file_has_text(tmpdir):
+    tmp_file = str(tmpdir.join('file.txt'))
+    assert not file_has_text(tmp_file, u'text\n')
+    with open(tmp_file, 'w') as stream:
+        stream.write(u'text\n')
+    assert file_has_text(tmp_file, u'text\n')
+    assert not file_has_text(tmp_file, u'test\n')
+    assert not file_has_text(tmp_file, u'text\n\n')
+
+
+def test_invalid_policy(tmpdir):
+    nb = readf(list_notebooks('ipynb_py')[0])
+    tmp_py = str(tmpdir.join('notebook.py'))
+    writef(nb, tmp_py)
+    with pytest.raises(ValueError):
+        writef(nb, tmp_py, if_unchanged='never')
+
+
+def test_sync_touches_unchanged_files(tmpdir):
+    tmp_ipynb = str(tmpdir.join('notebook.ipynb'))
+    tmp_py = str(tmpdir.join('notebook.py'))
+    nb = readf(list_notebooks('ipynb_py')[0])
+    nb.metadata.setdefault('jupytext', {})['formats'] = 'ipynb,py'
+    writef(nb, tmp_ipynb)
+    jupytext_cli(['--sync', tmp_ipynb])
+
+    set_mtime(tmp_ipynb, 1000000000)
+    set_mtime(tmp_py, 1000000010)
+    jupytext_cli(['--sync', tmp_ipynb, '--if-unchanged', 'skip'])
+    assert os.stat(tmp_ipynb).st_mtime == 1000000000
+    assert os.stat(tmp_py).st_mtime == 1000000010
+
+    jupytext_cli(['--sync', tmp_ipynb, '--if-unchanged', 'touch'])
+    # The text file is written after the ipynb file, and remains the most recent one
+    assert os.stat(tmp_py).st_mtime >= os.stat(tmp_ipynb).st_mtime > 1000000010
+
+
+def test_contents_manager_skips_unchanged_files(tmpdir):
+    tmp_ipynb = 'notebook.ipynb'
+    tmp_py = 'notebook.py'
+    nb = readf(list_notebooks('ipynb_py')[0])
+    nb.metadata.setdefault('jupytext', {})['formats'] = 'ipynb,py'
+
+    cm = jupytext.TextFileContentsManager()
+    cm.root_dir = str(tmpdir)
+    cm.if_unchanged = 'skip'
+    cm.save(model=dict(type='notebook', content=nb), path=tmp_ipynb)
+    text = tmpdir.join(tmp_py).read()
+
+    for path in [tmp_ipynb, tmp_py]:
+        set_mtime(str(tmpdir.join(path)), 1000000000)
+    cm.save(model=dict(type='notebook', content=nb), path=tmp_ipynb)
+    for path in [tmp_ipynb, tmp_py]:
+        assert os.stat(str(tmpdir.join(path))).st_mtime == 1000000000
+
+    cm.if_unchanged = 'touch'
+    cm.save(model=dict(type='notebook', content=nb), path=tmp_ipynb)
+    assert os.stat(str(tmpdir.join(tmp_py))).st_mtime > 1000000000
+    assert os.stat(str(tmpdir.join(tmp_ipynb))).st_mtime > 1000000000
+
+    nb.cells[-1].source += '\n# new line'
+    cm.save(model=dict(type='notebook', content=nb), path=tmp_ipynb)
+    assert tmpdir.join(tmp_py).read() != text
+    compare(nb.cells[-1].source, cm.get(tmp_py)['content'].cells[-1].source)
@@ -0,0 +1,54 @@
+import mock
+import pytest
+from testfixtures import compare
+import jupytext
+from jupytext.jupytext import IncrementalReader
+from jupytext.cell_reader import LightScriptCellReader
+from .utils import list_notebooks
+
+
+def edits(text):
+    """A few successive edits of a text notebook"""
+    lines = text.splitlines()
+    middle = len(lines) - 4
+    yield text
+    yield '\n'.join(lines[:middle] + ['', 'x = 1'] + lines[middle:]) + '\n'
+    yield '\n'.join(lines[:middle] + ['', 'x = 2', '# +'] + lines[middle:]) + '\n'
+    yield '\n'.join(lines[:middle] + lines[middle + 3:]) + '\n'
+    yield '\n'.join(lines[:-1] + ['', '# A new cell', '', '```python', '1 + 1', '```']) + '\n'
+    yield '\n'.join(lines[:-2]) + '\n'
+    yield text
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['py:light', 'py:percent', 'R:spin', 'md', 'Rmd'])
+def test_incremental_reads_same_as_reads(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    reader = IncrementalReader(fmt)
+    for text in edits(jupytext.writes(nb, fmt)):
+        compare(jupytext.reads(text, fmt), reader.reads(text))
+
+
+def test_incremental_reads_reads_only_the_cells_that_changed():
+    text = u'\n\n'.join(u'a{} = {}'.format(i, i) for i in range(100))
+    reader = IncrementalReader('py')
+    reader.reads(text)
+
+    text = text.replace(u'a50 = 50', u'a50 = 50\n\n\ndef f(x):\n    return x')
+    with mock.patch('jupytext.cell_reader.LightScriptCellReader.read',
+                    side_effect=LightScriptCellReader.read, autospec=True) as read:
+        nb = reader.reads(text)
+        assert read.call_count <= 4
+
+    compare(jupytext.reads(text, 'py'), nb)
+    assert nb.cells[51].source == 'def f(x):\n    return x'
+
+
+def test_incremental_reads_main_language_changes():
+    text = u'```R\n1 + 1\n```\n'
+    reader = IncrementalReader('md')
+    compare(jupytext.reads(text, 'md'), reader.reads(text))
+
+    text = u'```python\n1 + 1\n```\n\n```python\n2 + 2\n```\n\n' + text
+    compare(jupytext.reads(text, 'md'), reader.reads(text))
+    assert reader.main_language == 'python'
@@ -0,0 +1,65 @@
+import io
+import pytest
+from testfixtures import compare
+import jupytext
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['py:light', 'py:percent', 'R:spin', 'md'])
+def test_iter_cells_same_as_reads(nb_file, fmt, tmpdir):
+    nb = jupytext.readf(nb_file)
+    if fmt == 'md':
+        nb.metadata.setdefault('kernelspec', {'name': 'python3', 'language': 'python'})
+    fmt = jupytext.formats.long_form_one_format(fmt)
+    text = jupytext.writes(nb, fmt)
+    nb2 = jupytext.reads(text, fmt)
+
+    for chunk_size in [1, 5, 1000]:
+        cells = list(jupytext.iter_cells(io.StringIO(text), fmt, chunk_size=chunk_size))
+        compare(nb2.cells, cells)
+
+
+@pytest.mark.parametrize('text', [u'x = 1\n\n\n' + u'@deco\n' * 8 + u'def f(x):\n    return x\n',
+                                  u'x = 1\n\n\n@deco(a=1,\n      b=2)\n# comment\n@deco\nclass A:\n    pass\n'
+                                  u'\n\n@deco\ndef g():\n    pass\n\ny = 2\n'])
+def test_iter_cells_same_as_reads_with_decorated_functions(text):
+    nb = jupytext.reads(text, 'py:light')
+    for chunk_size in [1, 2, 3, 4, 5, 1000]:
+        cells = list(jupytext.iter_cells(io.StringIO(text), 'py:light', chunk_size=chunk_size))
+        compare(nb.cells, cells)
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['md', 'Rmd'])
+def test_iter_cells_same_as_reads_without_kernel(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    nb.metadata.pop('kernelspec', None)
+    text = jupytext.writes(nb, fmt)
+    nb2 = jupytext.reads(text, fmt)
+    compare(nb2.cells, list(jupytext.iter_cells(io.StringIO(text), fmt, chunk_size=1)))
+
+
+def test_iter_cells_reads_the_stream_by_chunks():
+    text = u'\n\n'.join(u'a{} = {}'.format(i, i) for i in range(100)) + u'\n'
+    stream = io.StringIO(text)
+    cells = jupytext.iter_cells(stream, 'py:light', chunk_size=10)
+
+    cell = next(cells)
+    assert cell.source == 'a0 = 0'
+    assert stream.tell() < len(text) / 5
+
+    assert len(list(cells)) == 99
+
+
+def test_iter_cells_guesses_the_format_beyond_the_first_chunk():
+    text = u'x = 1\n' * 1500 + u'\n# %%\ny = 2\n'
+    nb = jupytext.reads(text, 'py')
+    compare(nb.cells, list(jupytext.iter_cells(io.StringIO(text), 'py')))
+    assert nb.cells[-1].source == 'y = 2'
+
+
+def test_iter_cells_ipynb(nb_file=list_notebooks('ipynb_py')[0]):
+    nb = jupytext.readf(nb_file)
+    with io.open(nb_file, encoding='utf-8') as stream:
+        compare(nb.cells, list(jupytext.iter_cells(stream, '.ipynb')))
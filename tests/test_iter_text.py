@@ -0,0 +1,50 @@
+import io
+import mock
+import pytest
+from testfixtures import compare
+from nbformat.v4.nbbase import new_notebook, new_code_cell, new_markdown_cell
+import jupytext
+from jupytext.jupytext import iter_text, write
+from jupytext.cell_to_text import LightScriptCellExporter
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['py:light', 'py:percent', 'py:sphinx', 'R:spin', 'md', 'Rmd', 'ipynb'])
+def test_write_same_as_writes(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    text = jupytext.writes(nb, fmt)
+    if not text.endswith('\n'):
+        text += '\n'
+
+    stream = io.StringIO()
+    write(nb, stream, fmt)
+    compare(text, stream.getvalue())
+
+
+def test_iter_text_renders_one_cell_at_a_time():
+    nb = new_notebook(cells=[new_code_cell(u'def f{}(x):\n    return x'.format(i)) if i % 2 else
+                             new_markdown_cell(u'Markdown cell {}'.format(i)) for i in range(100)])
+
+    with mock.patch('jupytext.cell_to_text.LightScriptCellExporter.cell_to_text',
+                    side_effect=LightScriptCellExporter.cell_to_text, autospec=True) as cell_to_text:
+        text = iter_text(nb, 'py:light')
+        chunks = [next(text), next(text)]
+        assert chunks[1] == ['# Markdown cell 0', '']
+        assert cell_to_text.call_count <= 2
+        chunks.append(next(text))
+        assert chunks[2] == ['def f1(x):', '    return x', '', '']
+        # Is there code after the function? The markdown cell that follows is a comment
+        assert cell_to_text.call_count <= 4
+        chunks.extend(text)
+
+    compare(jupytext.writes(nb, 'py:light'), '\n'.join(line for lines in chunks for line in lines))
+
+
+def test_end_of_cell_depends_on_many_cells():
+    nb = new_notebook(cells=[new_code_cell(u'def f(x):\n    return x')] +
+                      [new_markdown_cell(u'Comment {}'.format(i)) for i in range(10)] +
+                      [new_code_cell(u'f(1)')])
+
+    text = jupytext.writes(nb, 'py:light')
+    compare(text, '\n'.join(line for lines in iter_text(nb, 'py:light') for line in lines))
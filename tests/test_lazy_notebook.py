@@ -0,0 +1,54 @@
+import mock
+import pytest
+from testfixtures import compare
+import jupytext
+from jupytext.cell_reader import LightScriptCellReader
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['py:light', 'py:percent', 'R:spin', 'md', 'Rmd'])
+def test_lazy_reads_same_as_reads(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    text = jupytext.writes(nb, fmt)
+    nb = jupytext.reads(text, fmt)
+    lazy = jupytext.reads(text, fmt, lazy=True)
+
+    compare(nb.metadata.get('kernelspec'), lazy.metadata.get('kernelspec'))
+    compare(nb.cells, list(lazy.cells))
+    compare(nb.metadata, lazy.metadata)
+    compare(nb, lazy.to_notebook())
+
+
+def test_lazy_reads_reads_only_the_cells_accessed():
+    text = u'# ---\n# jupyter:\n#   kernelspec:\n#     display_name: Python 3\n#     language: python\n' \
+           u'#     name: python3\n# ---\n\n' + \
+           u'\n\n'.join(u'a{} = {}'.format(i, i) for i in range(100))
+
+    with mock.patch('jupytext.cell_reader.LightScriptCellReader.read',
+                    side_effect=LightScriptCellReader.read, autospec=True) as read:
+        nb = jupytext.reads(text, 'py', lazy=True)
+        compare(nb.metadata['kernelspec'], {'display_name': 'Python 3', 'name': 'python3', 'language': 'python'})
+        assert read.call_count == 0
+
+        assert nb.cells[2].source == 'a2 = 2'
+        assert read.call_count <= 4
+
+        assert nb['cells'][-1].source == 'a99 = 99'
+        assert len(nb.cells) == 100
+        assert read.call_count == 100
+
+    compare(jupytext.reads(text, 'py').metadata, nb.metadata)
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+@pytest.mark.parametrize('fmt', ['py:percent', 'md'])
+def test_lazy_notebook_to_ipynb(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    text = jupytext.writes(nb, fmt)
+    nb = jupytext.reads(text, fmt)
+    lazy = jupytext.reads(text, fmt, lazy=True)
+
+    ipynb = jupytext.writes(lazy, 'ipynb')
+    compare(jupytext.writes(nb, 'ipynb'), ipynb)
+    compare(nb.cells, jupytext.reads(ipynb, 'ipynb').cells)
@@ -1,6 +1,7 @@
 import pytest
 from jupytext import reads, writes
 from jupytext.metadata_filter import filter_metadata, metadata_filter_as_dict
+from jupytext.metadata_filter import compile_metadata_filter, MetadataFilter
 
 
 def to_dict(keys):
@@ -52,6 +53,37 @@ def test_negative_cell_metadata_filter():
     assert filter_metadata(to_dict(['exectime']), '-linesto', '-exectime') == to_dict([])
 
 
+def test_compiled_metadata_filter_is_cached():
+    metadata_filter = compile_metadata_filter('user,-all', 'preserve')
+    assert compile_metadata_filter('user,-all', 'preserve') is metadata_filter
+    assert metadata_filter.include == {'user'}
+    assert metadata_filter.exclude == set()
+
+
+def test_compiled_metadata_filter_precomputes_the_keys():
+    metadata_filter = MetadataFilter('all,-user', '-technical')
+    assert metadata_filter.include is None
+    assert metadata_filter.exclude == {'user'}
+
+    metadata_filter = MetadataFilter('user', 'preserve,-all')
+    assert metadata_filter.include == {'user', 'preserve'}
+    assert metadata_filter.exclude == set()
+
+
+def test_compiled_metadata_filter_filters_in_place():
+    metadata = {'c': 1, 'technical': 2, 'b': 3, 'user': 4, 'a': 5}
+    assert compile_metadata_filter('-user', '-technical').filter(metadata) is metadata
+    assert list(metadata) == ['c', 'b', 'a']
+
+
+def test_dict_filters_are_not_modified():
+    user_filter = {'excluded': 'all'}
+    default_filter = {'additional': ['preserve']}
+    assert filter_metadata(to_dict(['technical', 'user', 'preserve']), user_filter, default_filter) == {}
+    assert user_filter == {'excluded': 'all'}
+    assert default_filter == {'additional': ['preserve']}
+
+
 def test_cell_metadata_filter_is_updated():
     text = """---
 jupyter:
@@ -0,0 +1,36 @@
+import mock
+import pytest
+from testfixtures import compare
+import jupytext
+from jupytext.jupytext import MultiFormatWriter
+from jupytext.languages import cell_language
+from .utils import list_notebooks
+
+FORMATS = ['ipynb', 'py:light', 'py:percent', 'py:hydrogen', 'md', 'Rmd', 'R:spin']
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py') + list_notebooks('ipynb_R'))
+def test_multi_format_writer_same_as_writes(nb_file):
+    nb = jupytext.readf(nb_file)
+    writer = MultiFormatWriter(nb)
+    for fmt in FORMATS:
+        compare(jupytext.writes(nb, fmt), writer.writes(fmt))
+
+
+def test_cells_are_analysed_once(nb_file=list_notebooks('ipynb_py')[0]):
+    nb = jupytext.readf(nb_file)
+    writer = MultiFormatWriter(nb)
+    with mock.patch('jupytext.cell_to_text.cell_language', side_effect=cell_language) as mock_cell_language:
+        for fmt in ['py:light', 'py:percent', 'md', 'Rmd']:
+            writer.writes(fmt)
+    assert mock_cell_language.call_count <= len(nb.cells)
+
+
+def test_writef_paired_formats(tmpdir, nb_file=list_notebooks('ipynb_py')[0]):
+    nb = jupytext.readf(nb_file)
+    writer = MultiFormatWriter(nb)
+    for ext in ['.ipynb', '.py', '.md']:
+        nb_dest = str(tmpdir.join('notebook' + ext))
+        writer.writef(nb_dest)
+        with open(nb_dest) as stream:
+            compare(jupytext.writes(nb, ext).rstrip('\n') + '\n', stream.read())
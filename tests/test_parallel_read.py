@@ -0,0 +1,44 @@
+import mock
+import pytest
+from testfixtures import compare
+import jupytext
+from jupytext.cell_reader import DoublePercentScriptCellReader, MarkdownCellReader, RMarkdownCellReader
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py'))
+@pytest.mark.parametrize('fmt', ['py:percent', 'py:hydrogen', 'md', 'Rmd'])
+def test_parallel_read_same_as_sequential_read(nb_file, fmt):
+    nb = jupytext.readf(nb_file)
+    text = jupytext.writes(nb, fmt)
+    nb = jupytext.reads(text, fmt)
+
+    with mock.patch('jupytext.jupytext._PARALLEL_READ_MIN_LINES', 1), mock.patch('multiprocessing.Pool') as pool:
+        pool.return_value.map.side_effect = lambda func, chunks: [func(chunk) for chunk in chunks]
+        nb2 = jupytext.reads(text, fmt, processes=16)
+
+    compare(nb, nb2)
+
+
+def test_parallel_read_in_process_pool():
+    nb = jupytext.readf(list_notebooks('ipynb_py')[0])
+    text = jupytext.writes(nb, 'py:percent')
+    nb = jupytext.reads(text, 'py:percent')
+
+    with mock.patch('jupytext.jupytext._PARALLEL_READ_MIN_LINES', 1):
+        compare(nb, jupytext.reads(text, 'py:percent', processes=2))
+
+
+def test_no_process_pool_for_short_documents():
+    with mock.patch('multiprocessing.Pool') as pool:
+        jupytext.reads('# %%\n1 + 1\n\n# %%\n2 + 2\n', 'py:percent', processes=2)
+    pool.assert_not_called()
+
+
+def test_find_cell_starts():
+    lines = ['# %%', '1 + 1', '', '# %% [markdown]', '# text', '', '#%%', '2 + 2']
+    compare(DoublePercentScriptCellReader({'extension': '.py'}).find_cell_starts(lines), [3, 6])
+
+    lines = ['text', '', '```python', '```bash', '```', '', '```', 'more text', '```', '```{r}', '```']
+    compare(MarkdownCellReader().find_cell_starts(lines), [2, 6, 9])
+    compare(RMarkdownCellReader().find_cell_starts(lines), [9])
@@ -93,6 +93,20 @@ a = 5
     assert pep8_lines_between_cells(prev_lines, next_lines, '.py') == 1
 
 
+def test_pep8_lines_between_cells_next_lines_is_an_iterator():
+    prev_lines = """def f(x):
+    return x""".splitlines()
+
+    next_lines = """# A markdown cell
+
+# An instruction
+a = 5
+""".splitlines()
+
+    assert pep8_lines_between_cells(prev_lines, iter(next_lines), '.py') == 2
+    assert pep8_lines_between_cells(prev_lines, iter(next_lines[:2]), '.py') == 1
+
+
 def test_pep8():
     text = """import os
 
@@ -0,0 +1,53 @@
+import mock
+import pytest
+import nbformat
+from testfixtures import compare
+import jupytext
+from jupytext.jupytext import read_ipynb_metadata
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py'))
+@pytest.mark.parametrize('ext', ['.ipynb', '.py', '.R', '.md', '.Rmd'])
+def test_read_metadata_same_as_readf(nb_file, ext, tmpdir):
+    nb = jupytext.readf(nb_file)
+    nb.metadata.setdefault('jupytext', {})['formats'] = 'ipynb,py:percent,md'
+    tmp_file = str(tmpdir.join('notebook' + ext))
+    jupytext.writef(nb, tmp_file)
+
+    nb = jupytext.readf(tmp_file)
+    metadata = jupytext.read_metadata(tmp_file)
+
+    compare(nb.metadata.get('kernelspec'), metadata.get('kernelspec'))
+    compare(nb.metadata['jupytext']['formats'], metadata['jupytext']['formats'])
+    if ext != '.ipynb':
+        compare(nb.metadata['jupytext']['text_representation'], metadata['jupytext']['text_representation'])
+
+
+def test_read_ipynb_metadata_reads_the_end_of_the_file(tmpdir):
+    tmp_ipynb = str(tmpdir.join('notebook.ipynb'))
+    nb = nbformat.v4.nbbase.new_notebook(
+        cells=[nbformat.v4.nbbase.new_code_cell(source='"metadata": {}\n' * 1000)],
+        metadata={'jupytext': {'formats': 'ipynb,py'}})
+    jupytext.writef(nb, tmp_ipynb)
+
+    with mock.patch('nbformat.read') as read:
+        metadata = read_ipynb_metadata(tmp_ipynb, block_size=64)
+    read.assert_not_called()
+    compare(metadata, {'jupytext': {'formats': 'ipynb,py'}})
+
+
+def test_read_ipynb_metadata_not_written_by_nbformat(tmpdir):
+    tmp_ipynb = tmpdir.join('notebook.ipynb')
+    tmp_ipynb.write('{"cells": [], "metadata": {"jupytext": {"formats": "ipynb,py"}}, '
+                    '"nbformat": 4, "nbformat_minor": 2}')
+    compare(read_ipynb_metadata(str(tmp_ipynb)), {'jupytext': {'formats': 'ipynb,py'}})
+
+
+def test_read_metadata_stops_after_the_header(tmpdir):
+    tmp_py = tmpdir.join('notebook.py')
+    tmp_py.write('# ---\n# jupyter:\n#   jupytext:\n#     formats: ipynb,py\n# ---\n\n' + '1 + 1\n\n' * 1000)
+    with mock.patch('jupytext.jupytext.parsed_document', wraps=jupytext.jupytext.parsed_document) as document:
+        metadata = jupytext.read_metadata(str(tmp_py))
+    assert len(document.call_args[0][0]) < 1000
+    compare(metadata['jupytext']['formats'], 'ipynb,py')
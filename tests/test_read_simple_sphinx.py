@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+import io
+import mock
 from testfixtures import compare
 import jupytext
 
@@ -125,3 +127,41 @@ Markdown cell
     assert len(nb.cells) == 3
 
     assert jupytext.writes(nb, 'py:sphinx') == script
+
+
+def test_rst2md_is_called_once_per_distinct_text(script=u'''"""
+Title
+=====
+"""
+
+1 + 1
+
+###############################################################################
+# Some *rst* text
+
+2 + 2
+
+###############################################################################
+# Some *rst* text
+'''):
+    fmt = {'extension': '.py', 'format_name': 'sphinx', 'rst2md': True}
+    jupytext.cell_reader._RST2MD_CACHE.clear()
+    with mock.patch('jupytext.cell_reader.rst2md', side_effect=lambda text: text.upper()) as rst2md:
+        nb = jupytext.reads(script, fmt)
+        assert rst2md.call_count == 2
+        compare([cell.source for cell in nb.cells if cell.cell_type == 'markdown'],
+                ['TITLE\n=====', 'SOME *RST* TEXT', 'SOME *RST* TEXT'])
+        compare(list(jupytext.iter_cells(io.StringIO(script), fmt)), nb.cells)
+
+        jupytext.reads(script, fmt)
+        assert rst2md.call_count == 2
+
+
+def test_rst2md_cache_is_bounded():
+    jupytext.cell_reader._RST2MD_CACHE.clear()
+    with mock.patch('jupytext.cell_reader._RST2MD_CACHE_SIZE', 2), \
+            mock.patch('jupytext.cell_reader.rst2md', side_effect=lambda text: text.upper()) as rst2md:
+        assert jupytext.cell_reader.rst2md_batch([u'a', u'b', u'a', u'c']) == [u'A', u'B', u'A', u'C']
+        assert rst2md.call_count == 3
+        assert jupytext.cell_reader.rst2md_batch([u'a', u'b']) == [u'A', u'B']
+        assert rst2md.call_count == 4
@@ -0,0 +1,61 @@
+import mock
+import pytest
+from testfixtures import compare
+from nbformat.validator import ValidationError
+import jupytext
+from jupytext.jupytext import TextNotebook
+from jupytext.cli import jupytext as jupytext_cli
+from .utils import list_notebooks
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('python') + list_notebooks('percent') + list_notebooks('Rmd') +
+                         list_notebooks('sphinx'))
+def test_text_notebook_is_written_like_the_notebook(nb_file):
+    fmt = {'format_name': 'sphinx'} if 'sphinx' in nb_file else None
+    notebook = jupytext.readf(nb_file, fmt)
+    records = jupytext.readf(nb_file, fmt, records=True)
+    assert isinstance(records, TextNotebook)
+    compare(notebook, records.to_notebook())
+    for fmt in ['md', 'Rmd', 'py:percent', 'py:light']:
+        compare(jupytext.writes(notebook, fmt), jupytext.writes(records, fmt))
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('python') + list_notebooks('percent') + list_notebooks('Rmd'))
+def test_text_notebook_to_ipynb(nb_file, tmpdir):
+    notebook = jupytext.readf(nb_file)
+    records = jupytext.readf(nb_file, records=True)
+    compare(jupytext.writes(notebook, 'ipynb'), jupytext.writes(records, 'ipynb'))
+
+    tmp_ipynb = str(tmpdir.join('notebook.ipynb'))
+    jupytext.writef(records, tmp_ipynb)
+    compare(notebook.cells, jupytext.readf(tmp_ipynb).cells)
+
+
+def test_text_notebook_is_not_validated():
+    text = '# + {"tags": "not a list"}\n1 + 1\n'
+    with pytest.raises(ValidationError):
+        jupytext.reads(text, 'py')
+
+    notebook = jupytext.reads(text, 'py', records=True)
+    assert notebook.cells[0].metadata == {'tags': 'not a list'}
+    with pytest.raises(ValidationError):
+        notebook.to_notebook()
+
+
+def test_text_to_text_conversion_uses_records(tmpdir):
+    tmp_py = str(tmpdir.join('notebook.py'))
+    tmp_md = str(tmpdir.join('notebook.md'))
+    tmp_ipynb = str(tmpdir.join('notebook.ipynb'))
+    with open(tmp_py, 'w') as fp:
+        fp.write('# A short notebook\n\n1 + 1\n')
+
+    with mock.patch('jupytext.cli.readf', side_effect=jupytext.readf) as readf:
+        jupytext_cli([tmp_py, '--to', 'md'])
+        assert readf.call_args[1] == {'records': True}
+
+        jupytext_cli([tmp_py, '--to', 'ipynb'])
+        assert readf.call_args[1] == {'records': False}
+
+    notebook = jupytext.readf(tmp_py)
+    compare(notebook.cells, jupytext.readf(tmp_md).cells)
+    compare(notebook.cells, jupytext.readf(tmp_ipynb).cells)
@@ -21,3 +21,29 @@ def test_write_non_ascii(tmpdir):
     nb = jupytext.reads(u'Non-ascii contênt', 'Rmd')
     jupytext.writef(nb, str(tmpdir.join('notebook.Rmd')))
     jupytext.writef(nb, str(tmpdir.join('notebook.ipynb')))
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 1 << 20])
+def test_read_lines_same_as_splitlines(tmpdir, block_size):
+    text = u'# coding: utf-8\r\nascii line\n\nNon-ascii contênt\rlast line\x0cwithout line break'
+    tmp_file = tmpdir.join('notebook.py')
+    tmp_file.write_binary(text.encode('utf-8'))
+
+    assert jupytext.jupytext.read_lines(str(tmp_file), block_size) == text.splitlines()
+    with open(str(tmp_file), 'rb') as stream:
+        assert jupytext.jupytext.read_lines(stream, block_size) == text.splitlines()
+
+
+def test_read_text_notebook_from_path_or_binary_stream(tmpdir):
+    text = u'# Non-ascii contênt\n\n1 + 1\n'
+    tmp_file = tmpdir.join('notebook.py')
+    tmp_file.write_binary(text.encode('utf-8'))
+
+    nb = jupytext.reads(text, 'py')
+    assert jupytext.readf(str(tmp_file)) == nb
+    assert jupytext.jupytext.read(str(tmp_file), 'py') == nb
+    with open(str(tmp_file), 'rb') as stream:
+        assert jupytext.jupytext.read(stream, 'py') == nb
+
+    tmp_file.write_binary(b'')
+    assert jupytext.readf(str(tmp_file)) == jupytext.reads(u'', 'py')
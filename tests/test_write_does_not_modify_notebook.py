@@ -2,14 +2,16 @@ import pytest
 from copy import deepcopy
 from testfixtures import compare
 from itertools import product
+from nbformat.v4.nbbase import new_notebook, new_markdown_cell, new_code_cell
 from jupytext import readf, writef, writes
+from jupytext.jupytext import TextNotebookConverter, metadata_to_write
 from jupytext.formats import long_form_one_format
 from .utils import list_notebooks
 
 
 @pytest.mark.parametrize('nb_file,fmt',
                          product(list_notebooks('ipynb_py') + list_notebooks('ipynb_R'),
-                                 ['auto:light', 'auto:percent', 'md', '.Rmd', '.ipynb']))
+                                 ['auto:light', 'auto:percent', 'auto:hydrogen', 'md', '.Rmd', '.ipynb']))
 def test_write_notebook_does_not_change_it(nb_file, fmt, tmpdir):
     nb_org = readf(nb_file)
     nb_org_copied = deepcopy(nb_org)
@@ -21,3 +23,29 @@ def test_write_notebook_does_not_change_it(nb_file, fmt, tmpdir):
     tmp_dest = str(tmpdir.join('notebook' + ext))
     writef(nb_org, tmp_dest, fmt)
     compare(nb_org, nb_org_copied)
+
+
+@pytest.mark.parametrize('nb_file', list_notebooks('ipynb_py'))
+def test_write_sphinx_does_not_change_notebook(nb_file):
+    nb_org = readf(nb_file)
+    nb_org_copied = deepcopy(nb_org)
+    writes(nb_org, 'py:sphinx')
+    compare(nb_org, nb_org_copied)
+
+
+def test_write_copies_only_the_jupytext_metadata():
+    widgets = {'state': {'model': {'model_name': 'LayoutModel'}}}
+    metadata = {'widgets': widgets, 'jupytext': {'formats': 'ipynb,py'}}
+    copied = metadata_to_write(metadata)
+    copied['jupytext']['main_language'] = 'python'
+    assert copied['widgets'] is widgets
+    assert metadata == {'widgets': widgets, 'jupytext': {'formats': 'ipynb,py'}}
+
+
+def test_converter_writes_without_metadata_argument():
+    nb = new_notebook(cells=[new_markdown_cell('A markdown cell'), new_code_cell('1 + 1')],
+                      metadata={'jupytext': {'main_language': 'python'}})
+    nb_copied = deepcopy(nb)
+    text = TextNotebookConverter({'extension': '.py', 'format_name': 'light'}).writes(nb)
+    assert text.endswith('# A markdown cell\n\n1 + 1\n')
+    compare(nb, nb_copied)
@@ -0,0 +1,71 @@
+import mock
+import pytest
+import yaml
+from testfixtures import compare
+from nbformat import NotebookNode
+from jupytext import yaml_header
+
+HEADER = """jupyter:
+  jupytext:
+    cell_metadata_filter: -all
+    formats: ipynb,py:percent
+    text_representation:
+      extension: .py
+      format_name: percent
+      format_version: '1.2'
+      jupytext_version: 1.0.0
+  kernelspec:
+    display_name: Python 3
+    language: python
+    name: python3
+"""
+
+
+def test_usual_header_is_parsed_without_pyyaml():
+    with mock.patch('yaml.load') as load:
+        data = yaml_header.load(HEADER)
+    load.assert_not_called()
+    compare(yaml.safe_load(HEADER), data)
+
+
+def test_usual_header_is_dumped_without_pyyaml():
+    data = yaml.safe_load(HEADER)
+    with mock.patch('yaml.safe_dump') as safe_dump:
+        text = yaml_header.dump(data)
+    safe_dump.assert_not_called()
+    compare(HEADER, text)
+
+
+@pytest.mark.parametrize('text', [
+    HEADER,
+    'jupyter:\n  a: yes\n  b: 1\n  c: 1.5\n  d: true\n  e: null\n  f: 2019-01-01\n',
+    "jupyter:\n  a: 'it''s'\n  b: ''\n  c: a:b\n  d: -1\n  e: -all\n  f: '1.0'\n",
+    'jupyter:\n  a: b\n  a: c\n  d:\n    e: f\n  d:\n    g: h\n',
+    'jupyter:\n    a: b\n    c: d\n',
+    'jupyter:\n  a: [1, 2]\n  b:\n  - c\n  - d\n',
+    'jupyter:\n  a: b # comment\n  c: "d"\n',
+    'jupyter:\n  a: b:\n',
+    'jupyter:\n  a: b\n c: d\n',
+    'jupyter:\n  a: b\n    c: d\n',
+    'jupyter:\n',
+    u'jupyter:\n  a: \u00e9\n'])
+def test_load_is_identical_to_safe_load(text):
+    try:
+        expected = yaml.safe_load(text)
+    except yaml.YAMLError:
+        with pytest.raises(yaml.YAMLError):
+            yaml_header.load(text)
+        return
+    actual = yaml_header.load(text)
+    compare(expected, actual)
+    assert repr(expected) == repr(actual)
+
+
+@pytest.mark.parametrize('data', [
+    yaml.safe_load(HEADER),
+    {'jupyter': {'a': 'yes', 'b': '1', 'c': '', 'd': "it's", 'e': 'a: b', 'f': 'a #b', 'g': True, 'h': -3}},
+    {'jupyter': {'a': u'\u00e9', 'b': 'a\nb', 'c': '\t', 'd': ' a', 'e': 'a ', 'f': '- a', 'g': '-a'}},
+    {'jupyter': {'a': 'word ' * 20, 'b': {}, 'c': None, 'd': 1.5, 'e': ['a', 'b'], 'yes': 1, 1: 2}},
+    {'jupyter': NotebookNode({'kernelspec': NotebookNode({'name': 'python3'})})}])
+def test_dump_is_identical_to_safe_dump(data):
+    compare(yaml.safe_dump(data, default_flow_style=False), yaml_header.dump(data))